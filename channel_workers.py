@@ -0,0 +1,256 @@
+"""Channel processing in worker processes with shared-memory frame transport."""
+from __future__ import annotations
+
+import logging
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+_HEADER_FIELDS = 3  # sequence number, height, width
+
+
+class SharedFrameRing:
+    """Fixed-size ring of BGR frames in shared memory.
+
+    The writer copies each frame into the next slot and publishes only
+    ``(slot, sequence)`` over a queue, so frames are never pickled. A slot's
+    sequence number is cleared while it is written, which lets the reader
+    detect frames overwritten before it got to them. Frames larger than
+    ``max_height`` x ``max_width`` are downscaled to fit.
+    """
+
+    def __init__(self, name: Optional[str] = None, slots: int = 4, max_height: int = 1080, max_width: int = 1920) -> None:
+        self.slots = slots
+        self.max_height = max_height
+        self.max_width = max_width
+        header_size = slots * _HEADER_FIELDS * 8
+        frame_size = max_height * max_width * 3
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_size + slots * frame_size)
+            self._owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        self._header = np.ndarray((slots, _HEADER_FIELDS), dtype=np.int64, buffer=self.shm.buf)
+        self._frames = np.ndarray((slots, max_height, max_width, 3), dtype=np.uint8, buffer=self.shm.buf, offset=header_size)
+        if self._owner:
+            self._header[:] = 0
+        self._sequence = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def spec(self) -> Tuple[str, int, int, int]:
+        """Arguments needed to attach to this ring from another process."""
+        return self.name, self.slots, self.max_height, self.max_width
+
+    def write(self, frame: np.ndarray) -> Tuple[int, int]:
+        """Copy ``frame`` into the next slot and return ``(slot, sequence)``."""
+        height, width = frame.shape[:2]
+        if height > self.max_height or width > self.max_width:
+            scale = min(self.max_height / height, self.max_width / width)
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+            height, width = frame.shape[:2]
+
+        self._sequence += 1
+        slot = self._sequence % self.slots
+        self._header[slot, 0] = 0
+        self._frames[slot, :height, :width] = frame
+        self._header[slot, 1] = height
+        self._header[slot, 2] = width
+        self._header[slot, 0] = self._sequence
+        return slot, self._sequence
+
+    def read(self, slot: int, sequence: int) -> Optional[np.ndarray]:
+        """Return a copy of the frame, or ``None`` if the slot has been overwritten since."""
+        if self._header[slot, 0] != sequence:
+            return None
+        height, width = int(self._header[slot, 1]), int(self._header[slot, 2])
+        frame = self._frames[slot, :height, :width].copy()
+        if self._header[slot, 0] != sequence:
+            return None
+        return frame
+
+    def close(self) -> None:
+        del self._header, self._frames
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+class ChannelWorkerPool:
+    """Runs channels in worker processes and collects their frames and plates.
+
+    Channels are split into groups of ``channels_per_worker``; every group
+    runs :func:`process_video_realtime` in its own process (one thread per
+    channel), so decoding, detection and OCR of different groups use
+    different cores. Annotated frames come back through a
+    :class:`SharedFrameRing` per channel; only small messages go through the
+    event queue:
+
+    * ``("frame", channel_index, slot, sequence)``
+    * ``("plate", channel_index, text)``
+    * ``("alert", channel_index, text)``
+    * ``("ready", worker_number, seconds)`` once the worker's models are loaded
+    * ``("stopped", channel_index)``
+    """
+
+    def __init__(
+        self,
+        channels: Sequence[Tuple[int, str]],
+        config_path: str | Path = "config.yaml",
+        channels_per_worker: int = 1,
+        ring_slots: int = 4,
+        max_frame_height: int = 1080,
+        max_frame_width: int = 1920,
+    ) -> None:
+        self.channels = list(channels)
+        self.config_path = str(config_path)
+        self.channels_per_worker = max(1, int(channels_per_worker))
+        self._context = mp.get_context("spawn")
+        self.events = self._context.Queue()
+        self._stop_event = self._context.Event()
+        self.rings: Dict[int, SharedFrameRing] = {
+            channel_index: SharedFrameRing(slots=ring_slots, max_height=max_frame_height, max_width=max_frame_width)
+            for channel_index, _ in self.channels
+        }
+        self._processes: List[mp.Process] = []
+
+    def start(self) -> "ChannelWorkerPool":
+        for start in range(0, len(self.channels), self.channels_per_worker):
+            group = [
+                (channel_index, video_path, self.rings[channel_index].spec())
+                for channel_index, video_path in self.channels[start : start + self.channels_per_worker]
+            ]
+            process = self._context.Process(
+                target=_worker_main,
+                args=(group, self.config_path, self.events, self._stop_event, start // self.channels_per_worker + 1),
+                name=f"channel-worker-{start // self.channels_per_worker}",
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+        return self
+
+    def poll(self, timeout: float = 0.05) -> List[tuple]:
+        """Drain pending events, resolving frame messages to ``("frame", channel_index, frame)``.
+
+        Only the newest frame of every channel is returned, older ones are skipped.
+        """
+        messages = []
+        try:
+            messages.append(self.events.get(timeout=timeout))
+            while True:
+                messages.append(self.events.get_nowait())
+        except queue.Empty:
+            pass
+
+        latest_frames: Dict[int, tuple] = {}
+        events = []
+        for message in messages:
+            if message[0] == "frame":
+                latest_frames[message[1]] = message
+            else:
+                events.append(message)
+        for _, channel_index, slot, sequence in latest_frames.values():
+            frame = self.rings[channel_index].read(slot, sequence)
+            if frame is not None:
+                events.append(("frame", channel_index, frame))
+        return events
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            # Keep draining the queue: a worker cannot exit while its queued messages are unread.
+            while process.is_alive() and time.monotonic() < deadline:
+                self._drain()
+                process.join(0.1)
+            if process.is_alive():
+                LOGGER.warning("Worker %s did not stop in time, terminating", process.name)
+                process.terminate()
+                process.join()
+        self._processes.clear()
+        self._drain()
+        for ring in self.rings.values():
+            ring.close()
+        self.rings.clear()
+
+    def _drain(self) -> None:
+        try:
+            while True:
+                self.events.get_nowait()
+        except queue.Empty:
+            pass
+
+
+def _worker_main(group, config_path: str, events, stop_event, worker_number: int) -> None:
+    from metrics import start_metrics_server
+    from utils.config import load_config
+
+    logging.basicConfig(level=logging.INFO)
+    config = load_config(config_path)
+    # Every worker serves its own channels' metrics on the next port after the main process.
+    start_metrics_server(config, port_offset=worker_number)
+    threading.Thread(target=_report_ready, args=(config, events, worker_number), name="ready", daemon=True).start()
+    threads = []
+    for channel_index, video_path, ring_spec in group:
+        ring = SharedFrameRing(*ring_spec)
+
+        def publish_frame(frame, channel_index=channel_index, ring=ring):
+            slot, sequence = ring.write(frame)
+            events.put(("frame", channel_index, slot, sequence))
+
+        def publish_plate(text, channel_index=channel_index):
+            events.put(("plate", channel_index, text))
+
+        def publish_alert(text, channel_index=channel_index):
+            events.put(("alert", channel_index, text))
+
+        thread = threading.Thread(
+            target=_run_channel,
+            args=(channel_index, video_path, ring, publish_frame, publish_plate, publish_alert, config_path, events, stop_event),
+            name=f"channel-{channel_index}",
+        )
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+
+def _report_ready(config: dict, events, worker_number: int) -> None:
+    from metrics import PROCESS_START
+    from process_video_realtime import start_model_loading
+
+    start_model_loading(config).wait()
+    events.put(("ready", worker_number, time.monotonic() - PROCESS_START))
+
+
+def _run_channel(
+    channel_index, video_path, ring, publish_frame, publish_plate, publish_alert, config_path, events, stop_event
+) -> None:
+    from process_video_realtime import process_video_realtime
+
+    try:
+        process_video_realtime(
+            video_path,
+            publish_frame,
+            publish_plate,
+            config_path,
+            stop_event,
+            channel_index,
+            alert_callback=publish_alert,
+        )
+    finally:
+        ring.close()
+        events.put(("stopped", channel_index))
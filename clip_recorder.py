@@ -0,0 +1,234 @@
+"""Recording of short clips around plate events from a compressed in-memory buffer."""
+from __future__ import annotations
+
+import collections
+import logging
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class _Clip:
+    path: Path
+    label: str
+    start: float
+    end: float
+    frames: List[Tuple[float, bytes]] = field(default_factory=list)
+    size: int = 0
+    part: int = 1
+
+
+class ClipRecorder:
+    """Keeps the last ``pre_seconds`` of a channel as JPEG and saves clips around events.
+
+    :meth:`add_frame` hands the frame to an encoder thread (frames arriving
+    while it is busy, or faster than ``fps``, are skipped) which downscales
+    it to ``max_width`` and stores it JPEG-compressed. The buffer never
+    exceeds ``max_buffer_mb``. :meth:`trigger` starts a clip from the
+    buffered frames; once ``post_seconds`` have been recorded the clip is
+    written to ``directory`` as MP4 by a writer thread. Events within a clip
+    that is still recording extend it instead of starting a new one; a clip
+    longer than ``max_clip_seconds`` is closed and continued in a new file.
+
+    ``max_buffer_mb`` bounds all compressed frames the channel holds: the
+    buffer, the clip being recorded and the clips waiting to be written.
+    The buffer gives way first; when clips alone fill the budget, further
+    frames are left out of the recording clip until the writer catches up.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        name: str = "channel",
+        pre_seconds: float = 5.0,
+        post_seconds: float = 5.0,
+        fps: float = 10.0,
+        max_width: int = 1280,
+        quality: int = 70,
+        max_buffer_mb: float = 32.0,
+        max_pending_clips: int = 4,
+        max_clip_seconds: float = 60.0,
+    ) -> None:
+        self.directory = Path(directory)
+        self.name = name
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.max_width = max_width
+        self.max_buffer_bytes = int(max_buffer_mb * 1024 * 1024)
+        self.max_clip_seconds = max(max_clip_seconds, pre_seconds + post_seconds)
+        self.skipped_frames = 0
+        self._params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+        self._buffer: Deque[Tuple[float, bytes]] = collections.deque()
+        self._buffer_bytes = 0
+        self._pending_bytes = 0
+        self._clip: Optional[_Clip] = None
+        self._lock = threading.Lock()
+        self._last_accepted = 0.0
+        self._pending_frame: "queue.Queue[Optional[Tuple[float, np.ndarray]]]" = queue.Queue(maxsize=1)
+        self._clips: "queue.Queue[Optional[_Clip]]" = queue.Queue(maxsize=max(1, max_pending_clips))
+        self._encoder = threading.Thread(target=self._encode_loop, name=f"clip-encoder-{name}", daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, name=f"clip-writer-{name}", daemon=True)
+        self._encoder.start()
+        self._writer.start()
+
+    @property
+    def buffer_bytes(self) -> int:
+        """Compressed frames held in memory: the buffer, the recording clip and clips waiting to be written."""
+        with self._lock:
+            return self._used_bytes()
+
+    def add_frame(self, frame: np.ndarray, timestamp: Optional[float] = None) -> None:
+        """Offer a BGR frame to the buffer without blocking the caller.
+
+        The frame is copied, so the caller may draw on it afterwards.
+        ``timestamp`` must come from the same clock as the one passed to
+        :meth:`trigger`.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if timestamp - self._last_accepted < 1.0 / self.fps:
+            return
+        try:
+            self._pending_frame.put_nowait((timestamp, frame.copy()))
+            self._last_accepted = timestamp
+        except queue.Full:
+            self.skipped_frames += 1
+
+    def trigger(self, label: str, timestamp: Optional[float] = None) -> str:
+        """Record a clip around an event at ``timestamp`` and return the path it will be written to."""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            if self._clip is not None:
+                self._clip.end = max(self._clip.end, timestamp + self.post_seconds)
+                return str(self._clip.path)
+            safe_label = re.sub(r"[^0-9A-Za-z]+", "_", label).strip("_")
+            start = timestamp - self.pre_seconds
+            frames = [item for item in self._buffer if item[0] >= start]
+            self._clip = _Clip(
+                self._clip_path(safe_label, timestamp),
+                safe_label,
+                frames[0][0] if frames else timestamp,
+                timestamp + self.post_seconds,
+                frames,
+                sum(len(data) for _, data in frames),
+            )
+            return str(self._clip.path)
+
+    def close(self) -> None:
+        """Finish the clip being recorded, write pending clips and stop the threads."""
+        self._pending_frame.put(None)
+        self._encoder.join()
+        with self._lock:
+            clip, self._clip = self._clip, None
+            if clip is not None:
+                self._pending_bytes += clip.size
+        if clip is not None:
+            self._queue_clip(clip)
+        self._clips.put(None)
+        self._writer.join()
+
+    def _encode_loop(self) -> None:
+        while True:
+            item = self._pending_frame.get()
+            if item is None:
+                return
+            timestamp, frame = item
+            height, width = frame.shape[:2]
+            if width > self.max_width:
+                scale = self.max_width / width
+                frame = cv2.resize(frame, (self.max_width, int(height * scale)), interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode(".jpg", frame, self._params)
+            if not ok:
+                continue
+            self._store((timestamp, encoded.tobytes()))
+
+    def _clip_path(self, label: str, timestamp: float, part: int = 1) -> Path:
+        moment = time.strftime("%Y%m%d_%H%M%S", time.localtime(timestamp))
+        suffix = f"_part{part}" if part > 1 else ""
+        return self.directory / f"{self.name}_{moment}_{label}{suffix}.mp4"
+
+    def _used_bytes(self) -> int:
+        # Frames of a clip started from the buffer are counted twice until the buffer drops them.
+        return self._buffer_bytes + (self._clip.size if self._clip is not None else 0) + self._pending_bytes
+
+    def _store(self, item: Tuple[float, bytes]) -> None:
+        finished: List[_Clip] = []
+        timestamp, data = item
+        with self._lock:
+            self._buffer.append(item)
+            self._buffer_bytes += len(data)
+            horizon = timestamp - self.pre_seconds
+            while self._buffer and (self._buffer[0][0] < horizon or self._used_bytes() > self.max_buffer_bytes):
+                self._buffer_bytes -= len(self._buffer.popleft()[1])
+            clip = self._clip
+            if clip is not None and timestamp - clip.start >= self.max_clip_seconds:
+                # Busy scenes keep extending the clip; cut it so neither the file nor its frames grow without end.
+                finished.append(clip)
+                self._pending_bytes += clip.size
+                part = clip.part + 1
+                clip = self._clip = _Clip(
+                    self._clip_path(clip.label, timestamp, part), clip.label, timestamp, clip.end, part=part
+                )
+            if clip is not None:
+                if self._used_bytes() + len(data) > self.max_buffer_bytes:
+                    self.skipped_frames += 1
+                else:
+                    clip.frames.append(item)
+                    clip.size += len(data)
+                if timestamp >= clip.end:
+                    finished.append(clip)
+                    self._pending_bytes += clip.size
+                    self._clip = None
+        for clip in finished:
+            self._queue_clip(clip)
+
+    def _queue_clip(self, clip: _Clip) -> None:
+        try:
+            self._clips.put_nowait(clip)
+        except queue.Full:
+            LOGGER.warning("Too many clips waiting to be written, dropping %s", clip.path)
+            with self._lock:
+                self._pending_bytes -= clip.size
+
+    def _write_loop(self) -> None:
+        while True:
+            clip = self._clips.get()
+            if clip is None:
+                return
+            try:
+                self._write(clip)
+            except (OSError, cv2.error) as exc:
+                LOGGER.error("Failed to write clip %s: %s", clip.path, exc)
+            with self._lock:
+                self._pending_bytes -= clip.size
+
+    def _write(self, clip: _Clip) -> None:
+        if not clip.frames:
+            return
+        duration = clip.frames[-1][0] - clip.frames[0][0]
+        fps = (len(clip.frames) - 1) / duration if duration > 0 else self.fps
+        self.directory.mkdir(parents=True, exist_ok=True)
+        writer = None
+        try:
+            for _, data in clip.frames:
+                frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if frame is None:
+                    continue
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    writer = cv2.VideoWriter(str(clip.path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+                writer.write(frame)
+        finally:
+            if writer is not None:
+                writer.release()
+        LOGGER.info("Saved clip %s (%s frames)", clip.path, len(clip.frames))
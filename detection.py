@@ -0,0 +1,231 @@
+"""Shared plate detector with cross-channel batched inference."""
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics import BATCH_SIZE_BUCKETS, METRICS
+from utils.config import DEFAULT_CHANNEL_SETTINGS
+
+LOGGER = logging.getLogger(__name__)
+
+PRETRAINED_MODEL_PATH = Path("models/best.pt")
+DETECTOR_BACKENDS = ("pytorch", "onnx", "openvino")
+
+
+@dataclass
+class Detection:
+    """Single detector box in frame coordinates."""
+
+    x1: int
+    y1: int
+    x2: int
+    y2: int
+    confidence: float
+    class_name: str
+    track_id: Optional[int] = None
+
+
+class YoloDetector:
+    """Runs the YOLO plate model on batches of frames.
+
+    ``model_path`` may point to PyTorch weights or to a model exported by
+    ``train/scripts/export_model.py`` (an ``.onnx`` file or an OpenVINO
+    model directory); Ultralytics picks the runtime from the path and the
+    boxes come out the same either way. Ultralytics sets up the predictor
+    and loads exported models only on the first call, so a blank frame is
+    run through the model at every size of ``warmup_sizes`` right away; this
+    also surfaces a missing runtime before any channel depends on it.
+    """
+
+    def __init__(self, model_path: Path | str = PRETRAINED_MODEL_PATH, warmup_sizes: Sequence[int] = ()) -> None:
+        model_path = Path(model_path)
+        if not model_path.exists():
+            raise FileNotFoundError(f"Model weights not found at {model_path}")
+        # Imported here so that importing this module does not pull in torch.
+        from ultralytics import YOLO
+
+        self.model_path = model_path
+        self.model = YOLO(str(model_path), task="detect")
+        self._lock = threading.Lock()
+        for imgsz in warmup_sizes:
+            self.detect([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)], imgsz)
+
+    def detect(self, frames: Sequence[np.ndarray], imgsz: Optional[int] = None) -> List[List[Detection]]:
+        """Detect objects on every frame of the batch in a single forward pass.
+
+        ``imgsz`` overrides the model's input size; ``None`` keeps its default.
+        """
+        options = {"imgsz": imgsz} if imgsz else {}
+        with self._lock:
+            results = self.model.predict(list(frames), verbose=False, **options)
+        return [self._to_detections(result) for result in results]
+
+    def _to_detections(self, result) -> List[Detection]:
+        boxes = result.boxes.cpu().numpy()
+        detections = []
+        for xyxy, confidence, class_id in zip(boxes.xyxy, boxes.conf, boxes.cls):
+            x1, y1, x2, y2 = xyxy.astype(int)
+            detections.append(
+                Detection(int(x1), int(y1), int(x2), int(y2), float(confidence), self.model.names[int(class_id)])
+            )
+        return detections
+
+
+def default_model_path(backend: str, int8: bool = False) -> Path:
+    """Where the export script puts the model for ``backend``, next to the PyTorch weights."""
+    if backend == "pytorch":
+        return PRETRAINED_MODEL_PATH
+    stem = f"{PRETRAINED_MODEL_PATH.stem}_int8" if int8 else PRETRAINED_MODEL_PATH.stem
+    if backend == "onnx":
+        return PRETRAINED_MODEL_PATH.with_name(f"{stem}.onnx")
+    return PRETRAINED_MODEL_PATH.with_name(f"{stem}_openvino_model")
+
+
+def create_detector(config: dict, warmup_sizes: Sequence[int] = (DEFAULT_CHANNEL_SETTINGS["imgsz"],)) -> YoloDetector:
+    """Load and warm up the detector backend selected in a ``detection`` config section.
+
+    If an exported model is missing or its runtime is not installed, the
+    PyTorch weights are used instead.
+    """
+    backend = config.get("backend", "pytorch")
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend {backend!r}, expected one of {DETECTOR_BACKENDS}")
+    if backend == "pytorch":
+        return YoloDetector(config.get("model_path") or PRETRAINED_MODEL_PATH, warmup_sizes)
+    model_path = Path(config.get("model_path") or default_model_path(backend, config.get("int8", False)))
+    try:
+        detector = YoloDetector(model_path, warmup_sizes)
+    except Exception as exc:  # noqa: BLE001
+        LOGGER.warning("Cannot load %s detector %s, falling back to PyTorch: %s", backend, model_path, exc)
+        return YoloDetector(PRETRAINED_MODEL_PATH, warmup_sizes)
+    LOGGER.info("Using %s detector %s", backend, model_path)
+    return detector
+
+
+class DetectionScheduler:
+    """Collects the latest frame from every channel and detects them in one batch.
+
+    Channels call :meth:`register` once and then :meth:`detect` for every frame.
+    A background thread dispatches a batch as soon as every registered channel
+    has a frame waiting, ``max_batch_size`` frames are queued, or the oldest
+    frame has waited ``max_wait`` seconds, whichever happens first. Frames
+    are only batched with frames requesting the same detector input size.
+    """
+
+    def __init__(self, detector: YoloDetector, max_batch_size: int = 8, max_wait: float = 0.015) -> None:
+        self.detector = detector
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+        self._pending: Dict[int, Tuple[np.ndarray, Optional[int], Future, float]] = {}
+        self._channels: set[int] = set()
+        self._channel_ids = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="detection-scheduler", daemon=True)
+        self._thread.start()
+
+    def register(self) -> int:
+        """Register a channel and return the id to pass to :meth:`detect`."""
+        with self._condition:
+            channel_id = next(self._channel_ids)
+            self._channels.add(channel_id)
+            return channel_id
+
+    def unregister(self, channel_id: int) -> None:
+        with self._condition:
+            self._channels.discard(channel_id)
+            pending = self._pending.pop(channel_id, None)
+            self._condition.notify()
+        if pending is not None:
+            pending[2].cancel()
+
+    def submit(self, channel_id: int, frame: np.ndarray, imgsz: Optional[int] = None) -> Future:
+        """Queue ``frame`` for detection, replacing any frame still waiting for this channel."""
+        future: Future = Future()
+        with self._condition:
+            previous = self._pending.pop(channel_id, None)
+            self._pending[channel_id] = (frame, imgsz, future, time.monotonic())
+            METRICS.set("plate_detection_queue_depth", len(self._pending))
+            self._condition.notify()
+        if previous is not None:
+            previous[2].cancel()
+        return future
+
+    def detect(self, channel_id: int, frame: np.ndarray, imgsz: Optional[int] = None) -> List[Detection]:
+        """Detect objects on ``frame`` and block until the batch containing it is done."""
+        return self.submit(channel_id, frame, imgsz).result()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._condition.notify_all()
+        for _, _, future, _ in pending:
+            future.cancel()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            next_batch = self._next_batch()
+            if next_batch is None:
+                return
+            imgsz, batch = next_batch
+            if not batch:
+                continue
+            frames = [frame for frame, _ in batch]
+            METRICS.observe("plate_detection_batch_size", len(frames), buckets=BATCH_SIZE_BUCKETS)
+            try:
+                with METRICS.time("plate_stage_seconds", channel="shared", stage="detect_batch"):
+                    results = self.detector.detect(frames, imgsz)
+            except Exception as exc:  # noqa: BLE001
+                LOGGER.error("Batched detection failed: %s", exc)
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), detections in zip(batch, results):
+                future.set_result(detections)
+
+    def _next_batch(self) -> Optional[Tuple[Optional[int], List[Tuple[np.ndarray, Future]]]]:
+        with self._condition:
+            while not self._stopped and not self._pending:
+                self._condition.wait()
+            if self._stopped:
+                return None
+
+            oldest = min(submitted for _, _, _, submitted in self._pending.values())
+            deadline = oldest + self.max_wait
+            while not self._stopped and not self._batch_ready():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            if self._stopped:
+                return None
+
+            if not self._pending:
+                return None, []
+            first = min(self._pending, key=lambda channel_id: self._pending[channel_id][3])
+            imgsz = self._pending[first][1]
+            channel_ids = [channel_id for channel_id, entry in self._pending.items() if entry[1] == imgsz]
+            batch = []
+            for channel_id in channel_ids[: self.max_batch_size]:
+                frame, _, future, _ = self._pending.pop(channel_id)
+                if future.set_running_or_notify_cancel():
+                    batch.append((frame, future))
+            METRICS.set("plate_detection_queue_depth", len(self._pending))
+            return imgsz, batch
+
+    def _batch_ready(self) -> bool:
+        if len(self._pending) >= self.max_batch_size:
+            return True
+        return bool(self._channels) and self._channels.issubset(self._pending)
@@ -0,0 +1,246 @@
+"""Persistent, indexed storage of plate events in SQLite."""
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import cv2
+
+from plate_events import PlateEvent
+from utils.config import DEFAULT_CONFIG
+from watchlist import normalize_plate
+
+LOGGER = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    channel INTEGER,
+    source TEXT,
+    track_id INTEGER,
+    plate TEXT NOT NULL,
+    plate_key TEXT,
+    region TEXT,
+    confidence REAL,
+    thumbnail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_plate_key_time ON events (plate_key, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_channel_time ON events (channel, timestamp);
+"""
+_COLUMNS = "id, timestamp, channel, source, track_id, plate, region, confidence, thumbnail"
+
+STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+@dataclass
+class SearchPage:
+    """One page of search results, newest first."""
+
+    events: List[PlateEvent]
+    cursor: Optional[Tuple[float, int]]
+
+
+class PlateEventStore:
+    """Stores plate events in a SQLite database in WAL mode.
+
+    :meth:`add` only enqueues the event; a background thread writes plate
+    thumbnails and inserts events in batches of up to ``batch_size`` rows or
+    every ``flush_interval`` seconds, so the processing threads never wait
+    for disk I/O. Plates are also stored in their normalized form (see
+    :func:`watchlist.normalize_plate`), which is what searches compare
+    against, so ``А123ВС77`` typed in Cyrillic finds ``A123BC 77``. Queries
+    use indexes on the normalized plate, time and channel, and results are
+    paged with a ``(timestamp, id)`` cursor.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "data/plate_events.db",
+        thumbnails_dir: str | Path | None = "data/thumbnails",
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.thumbnails_dir = Path(thumbnails_dir) if thumbnails_dir else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[PlateEvent]]" = queue.Queue(maxsize=max_queue)
+        self._read_lock = threading.Lock()
+        self._reader = self._connect()
+        self._reader.executescript(_SCHEMA)
+        self._writer_thread: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    def add(self, event: PlateEvent) -> None:
+        """Queue ``event`` for writing; drops it if the writer is too far behind."""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            LOGGER.warning("Event store queue is full, dropping plate %s", event.label)
+
+    def search(
+        self,
+        plate: str = "",
+        prefix: bool = False,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        channel: Optional[int] = None,
+        limit: int = 100,
+        cursor: Optional[Tuple[float, int]] = None,
+    ) -> SearchPage:
+        """Find events by exact plate or plate prefix within an optional time range.
+
+        Pass the returned ``cursor`` back to fetch the next (older) page.
+        """
+        conditions, params = [], []
+        plate = normalize_plate(plate)
+        if plate and prefix:
+            conditions.append("plate_key >= ? AND plate_key < ?")
+            params += [plate, plate[:-1] + chr(ord(plate[-1]) + 1)]
+        elif plate:
+            conditions.append("plate_key = ?")
+            params.append(plate)
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("timestamp <= ?")
+            params.append(end)
+        if channel is not None:
+            conditions.append("channel = ?")
+            params.append(channel)
+        if cursor is not None:
+            conditions.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params += [cursor[0], cursor[0], cursor[1]]
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"SELECT {_COLUMNS} FROM events {where} ORDER BY timestamp DESC, id DESC LIMIT ?"
+        with self._read_lock:
+            rows = self._reader.execute(query, [*params, limit]).fetchall()
+
+        events = [
+            PlateEvent(
+                channel=row[2],
+                source=row[3],
+                timestamp=row[1],
+                track_id=row[4],
+                plate=row[5],
+                region=row[6],
+                confidence=row[7],
+                thumbnail=row[8],
+            )
+            for row in rows
+        ]
+        next_cursor = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+        return SearchPage(events, next_cursor)
+
+    def close(self) -> None:
+        """Write all queued events and stop the writer thread."""
+        with self._writer_lock:
+            if self._writer_thread is not None:
+                self._queue.put(None)
+                self._writer_thread.join()
+                self._writer_thread = None
+        with self._read_lock:
+            self._reader.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _ensure_writer(self) -> None:
+        if self._writer_thread is not None:
+            return
+        with self._writer_lock:
+            if self._writer_thread is None:
+                self._writer_thread = threading.Thread(target=self._write_loop, name="event-store-writer", daemon=True)
+                self._writer_thread.start()
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        batch: List[PlateEvent] = []
+        deadline = time.monotonic() + self.flush_interval
+        running = True
+        while running:
+            try:
+                event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if event is None:
+                    running = False
+                else:
+                    batch.append(event)
+            except queue.Empty:
+                pass
+            if batch and (not running or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._insert(connection, batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+        connection.close()
+
+    def _insert(self, connection: sqlite3.Connection, events: List[PlateEvent]) -> None:
+        rows = []
+        for event in events:
+            if event.thumbnail is None and event.crop is not None:
+                event.thumbnail = self._save_thumbnail(event)
+            rows.append(
+                (
+                    event.timestamp,
+                    event.channel,
+                    event.source,
+                    event.track_id,
+                    event.plate,
+                    normalize_plate(event.plate),
+                    event.region,
+                    event.confidence,
+                    event.thumbnail,
+                )
+            )
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT INTO events "
+                    "(timestamp, channel, source, track_id, plate, plate_key, region, confidence, thumbnail) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as exc:
+            LOGGER.error("Failed to store %s plate events: %s", len(rows), exc)
+
+    def _save_thumbnail(self, event: PlateEvent) -> Optional[str]:
+        if self.thumbnails_dir is None:
+            return None
+        directory = self.thumbnails_dir / time.strftime("%Y%m%d", time.localtime(event.timestamp))
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{event.channel}_{int(event.timestamp * 1000)}_{event.track_id}.jpg"
+        if not cv2.imwrite(str(path), event.crop):
+            LOGGER.warning("Failed to write thumbnail %s", path)
+            return None
+        return str(path)
+
+
+def get_event_store(config: dict) -> Optional[PlateEventStore]:
+    """Return the process-wide event store, or ``None`` when it is disabled."""
+    global STORE
+    store_config = {**DEFAULT_CONFIG["event_store"], **config.get("event_store", {})}
+    if not store_config.pop("enabled"):
+        return None
+    with _STORE_LOCK:
+        if STORE is None:
+            STORE = PlateEventStore(**store_config)
+            atexit.register(STORE.close)
+        return STORE
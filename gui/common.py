@@ -3,11 +3,13 @@ from __future__ import annotations
 
 import sys
 
-from PyQt5.QtCore import QThread, Qt, pyqtSignal
+from PyQt5.QtCore import QDateTime, QThread, QTimer, Qt, pyqtSignal
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtWidgets import (
     QApplication,
+    QCheckBox,
     QComboBox,
+    QDateTimeEdit,
     QDesktopWidget,
     QFileDialog,
     QFormLayout,
@@ -51,5 +53,9 @@ __all__ = [
     "QSpinBox",
     "QGridLayout",
     "QComboBox",
+    "QCheckBox",
+    "QDateTimeEdit",
+    "QDateTime",
+    "QTimer",
     "sys",
 ]
@@ -2,9 +2,17 @@
 from __future__ import annotations
 
 import sys
+import threading
+import time
+
+import cv2
 
 from gui.common import (
     QApplication,
+    QCheckBox,
+    QComboBox,
+    QDateTime,
+    QDateTimeEdit,
     QFileDialog,
     QDesktopWidget,
     QFormLayout,
@@ -20,35 +28,131 @@ from gui.common import (
     QVBoxLayout,
     QWidget,
     QPixmap,
+    Qt,
     QThread,
+    QTimer,
     pyqtSignal,
 )
-from process_video_realtime import process_video_realtime
-from utils.config import load_config, save_config
+from channel_workers import ChannelWorkerPool
+from event_store import get_event_store
+from load_shedding import DEGRADATION_LEVELS
+from metrics import METRICS, PROCESS_START
+from watchlist import get_watchlist
+from roi import format_roi, parse_roi
+from utils.config import get_channel_settings, load_config, save_config
 
 
 class VideoThread(QThread):
     frame_signal = pyqtSignal(QImage)
     text_signal = pyqtSignal(str)
+    alert_signal = pyqtSignal(str)
 
-    def __init__(self, video_path: str, config_path: str):
+    def __init__(self, video_path: str, config_path: str, channel_index: int | None = None):
         super().__init__()
         self.video_path = video_path
         self.config_path = config_path
+        self.channel_index = channel_index
+        self.stop_event = threading.Event()
 
     def run(self):
+        # Imported here: loading torch, YOLO and EasyOCR must not hold up the window.
+        from process_video_realtime import process_video_realtime
+
         try:
-            process_video_realtime(self.video_path, self.frame_signal.emit, self.text_signal.emit, self.config_path)
+            process_video_realtime(
+                self.video_path,
+                self.emit_frame,
+                self.text_signal.emit,
+                self.config_path,
+                self.stop_event,
+                self.channel_index,
+                alert_callback=self.alert_signal.emit,
+            )
         except Exception as exc:  # noqa: BLE001
             print(f"Error during video processing: {exc}")
 
+    def emit_frame(self, frame):
+        self.frame_signal.emit(to_qimage(frame))
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class ModelLoaderThread(QThread):
+    """Starts loading the models in the background and reports when they are ready."""
+
+    ready_signal = pyqtSignal(float)
+
+    def __init__(self, config_path: str):
+        super().__init__()
+        self.config_path = config_path
+        self.stop_event = threading.Event()
+
+    def run(self):
+        from process_video_realtime import start_model_loading
+
+        models_ready = start_model_loading(load_config(self.config_path))
+        while not self.stop_event.is_set():
+            if models_ready.wait(0.5):
+                self.ready_signal.emit(time.monotonic() - PROCESS_START)
+                return
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class WorkerBridgeThread(QThread):
+    """Forwards frames and plates from channel worker processes to the GUI."""
+
+    frame_signal = pyqtSignal(QImage)
+    text_signal = pyqtSignal(str)
+    alert_signal = pyqtSignal(str)
+    ready_signal = pyqtSignal(float)
+
+    def __init__(self, pool: ChannelWorkerPool):
+        super().__init__()
+        self.pool = pool
+        self.stop_event = threading.Event()
+
+    def run(self):
+        self.pool.start()
+        while not self.stop_event.is_set():
+            for event in self.pool.poll():
+                if event[0] == "frame":
+                    self.frame_signal.emit(to_qimage(event[2]))
+                elif event[0] == "plate":
+                    self.text_signal.emit(event[2])
+                elif event[0] == "alert":
+                    self.alert_signal.emit(event[2])
+                elif event[0] == "ready":
+                    self.ready_signal.emit(event[2])
+        self.pool.stop()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+SEARCH_PAGE_SIZE = 100
+
+
+def to_qimage(frame) -> QImage:
+    """Convert an annotated BGR frame into a QImage for display."""
+    frame_for_gui = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    height, width, channel = frame_for_gui.shape
+    bytes_per_line = 3 * width
+    # QImage only wraps the buffer; copy it so the image outlives the converted array.
+    return QImage(frame_for_gui.data, width, height, bytes_per_line, QImage.Format_RGB888).copy()
+
 
 class MainWindow(QMainWindow):
     def __init__(self, config_path: str = "config.yaml"):
         super().__init__()
         self.config_path = config_path
         self.recognized_plates = set()
-        self.video_threads: list[VideoThread] = []
+        self.video_threads: list[VideoThread | WorkerBridgeThread] = []
+        self.model_loader: ModelLoaderThread | None = None
+        self.models_expected = 0
+        self.models_ready = 0
         self.config = load_config(self.config_path)
         self.initUI()
         self.start_processing()
@@ -59,6 +163,10 @@ class MainWindow(QMainWindow):
             self.events_list.addItem(item)
             self.recognized_plates.add(text)
 
+    def show_alert(self, text: str):
+        self.alerts_list.insertItem(0, QListWidgetItem(f"{time.strftime('%H:%M:%S')}  {text}"))
+        self.tab_widget.setCurrentWidget(self.lists_tab)
+
     def initUI(self):
         self.setWindowTitle("Программа для распознования автомобильных номеров")
         screen = QDesktopWidget().screenGeometry()
@@ -80,6 +188,9 @@ class MainWindow(QMainWindow):
         self.video_label.setScaledContents(True)
         video_and_list_layout.addWidget(self.video_label)
 
+        self.models_label = QLabel("Загрузка моделей…", self)
+        main_layout.addWidget(self.models_label)
+
         self.tab_widget = QTabWidget(self)
         list_width = int(window_width * 0.3)
         list_height = int(window_height * 0.7)
@@ -89,11 +200,13 @@ class MainWindow(QMainWindow):
         self.events_list = QListWidget(self)
         self.tab_widget.addTab(self.events_list, "События")
 
-        self.search_list = QListWidget(self)
-        self.tab_widget.addTab(self.search_list, "Поиск")
+        self.search_tab = QWidget()
+        self.init_search_tab()
+        self.tab_widget.addTab(self.search_tab, "Поиск")
 
-        self.lists_list = QListWidget(self)
-        self.tab_widget.addTab(self.lists_list, "Списки")
+        self.lists_tab = QWidget()
+        self.init_lists_tab()
+        self.tab_widget.addTab(self.lists_tab, "Списки")
 
         self.settings_tab = QWidget()
         self.init_settings_tab()
@@ -104,25 +217,182 @@ class MainWindow(QMainWindow):
     def start_processing(self):
         self.stop_processing()
         self.video_threads = []
-        for video_path in self.config["video_paths"]:
-            if not video_path:
-                continue
-            video_thread = VideoThread(video_path, self.config_path)
+        channels = [(index, video_path) for index, video_path in enumerate(self.config["video_paths"]) if video_path]
+        workers_config = self.config.get("workers", {})
+        if workers_config.get("enabled") and channels:
+            pool = ChannelWorkerPool(
+                channels,
+                self.config_path,
+                channels_per_worker=workers_config.get("channels_per_worker", 1),
+                ring_slots=workers_config.get("ring_slots", 4),
+                max_frame_height=workers_config.get("max_frame_height", 1080),
+                max_frame_width=workers_config.get("max_frame_width", 1920),
+            )
+            video_threads = [WorkerBridgeThread(pool)]
+            channels_per_worker = max(1, int(workers_config.get("channels_per_worker", 1)))
+            self.models_expected = -(-len(channels) // channels_per_worker)
+            video_threads[0].ready_signal.connect(self.on_models_ready)
+        else:
+            video_threads = [VideoThread(video_path, self.config_path, index) for index, video_path in channels]
+            self.models_expected = 1
+            self.model_loader = ModelLoaderThread(self.config_path)
+            self.model_loader.ready_signal.connect(self.on_models_ready)
+            self.model_loader.start()
+        self.models_ready = 0
+        self.models_label.setText("Загрузка моделей…")
+
+        for video_thread in video_threads:
             video_thread.frame_signal.connect(self.update_frame)
             video_thread.text_signal.connect(self.update_text)
+            video_thread.alert_signal.connect(self.show_alert)
             video_thread.start()
             self.video_threads.append(video_thread)
 
     def stop_processing(self):
+        if self.model_loader is not None:
+            self.model_loader.stop()
+            self.model_loader.wait()
+            self.model_loader = None
         for video_thread in self.video_threads:
             if video_thread and video_thread.isRunning():
-                video_thread.terminate()
+                video_thread.stop()
                 video_thread.wait()
 
+    def on_models_ready(self, seconds: float):
+        self.models_ready += 1
+        if self.models_ready < self.models_expected:
+            self.models_label.setText(f"Загрузка моделей: готово в {self.models_ready} из {self.models_expected} процессов")
+        else:
+            self.models_label.setText(f"Модели готовы через {seconds:.1f} с после запуска")
+
     def update_frame(self, q_img: QImage):
         pixmap = QPixmap.fromImage(q_img)
         self.video_label.setPixmap(pixmap)
 
+    def init_search_tab(self):
+        layout = QVBoxLayout(self.search_tab)
+
+        form_layout = QFormLayout()
+        self.search_edit = QLineEdit(self)
+        self.search_edit.setPlaceholderText("Номер или его начало")
+        self.search_edit.returnPressed.connect(self.run_search)
+        form_layout.addRow("Номер:", self.search_edit)
+
+        self.search_mode_combo = QComboBox(self)
+        self.search_mode_combo.addItems(["Точное совпадение", "По началу номера"])
+        form_layout.addRow("Поиск:", self.search_mode_combo)
+
+        self.search_period_check = QCheckBox("Только за период", self)
+        form_layout.addRow(self.search_period_check)
+        now = QDateTime.currentDateTime()
+        self.search_from_edit = QDateTimeEdit(now.addDays(-1), self)
+        self.search_from_edit.setCalendarPopup(True)
+        form_layout.addRow("С:", self.search_from_edit)
+        self.search_to_edit = QDateTimeEdit(now, self)
+        self.search_to_edit.setCalendarPopup(True)
+        form_layout.addRow("По:", self.search_to_edit)
+        layout.addLayout(form_layout)
+
+        search_button = QPushButton("Найти", self)
+        search_button.clicked.connect(self.run_search)
+        layout.addWidget(search_button)
+
+        self.search_list = QListWidget(self)
+        self.search_list.verticalScrollBar().valueChanged.connect(self.on_search_scrolled)
+        layout.addWidget(self.search_list)
+        self.search_query = None
+        self.search_cursor = None
+
+    def run_search(self):
+        self.search_list.clear()
+        self.search_cursor = None
+        self.search_query = {
+            "plate": self.search_edit.text(),
+            "prefix": self.search_mode_combo.currentIndex() == 1,
+        }
+        if self.search_period_check.isChecked():
+            self.search_query["start"] = float(self.search_from_edit.dateTime().toSecsSinceEpoch())
+            self.search_query["end"] = float(self.search_to_edit.dateTime().toSecsSinceEpoch())
+        self.load_search_page()
+
+    def load_search_page(self):
+        """Append the next page of results; further pages are loaded as the list is scrolled down."""
+        store = get_event_store(self.config)
+        if store is None:
+            self.search_list.addItem("Хранилище событий отключено в настройках")
+            return
+        page = store.search(**self.search_query, limit=SEARCH_PAGE_SIZE, cursor=self.search_cursor)
+        for event in page.events:
+            moment = time.strftime("%d.%m.%Y %H:%M:%S", time.localtime(event.timestamp))
+            channel = f"канал {event.channel + 1}" if event.channel is not None else event.source
+            item = QListWidgetItem(f"{moment}  {event.label}  ({channel})")
+            if event.thumbnail:
+                item.setToolTip(event.thumbnail)
+            self.search_list.addItem(item)
+        self.search_cursor = page.cursor
+
+    def on_search_scrolled(self, value: int):
+        if self.search_cursor is not None and value >= self.search_list.verticalScrollBar().maximum():
+            self.load_search_page()
+
+    def init_lists_tab(self):
+        layout = QVBoxLayout(self.lists_tab)
+        self.watchlist = get_watchlist(self.config)
+        if self.watchlist is None:
+            layout.addWidget(QLabel("Списки номеров отключены в настройках", self))
+            self.alerts_list = QListWidget(self)
+            layout.addWidget(self.alerts_list)
+            return
+
+        self.lists_summary_label = QLabel(self)
+        layout.addWidget(self.lists_summary_label)
+
+        add_layout = QHBoxLayout()
+        self.list_name_combo = QComboBox(self)
+        self.list_name_combo.setEditable(True)
+        add_layout.addWidget(self.list_name_combo)
+        self.list_plate_edit = QLineEdit(self)
+        self.list_plate_edit.setPlaceholderText("Номер")
+        add_layout.addWidget(self.list_plate_edit, 2)
+        add_button = QPushButton("Добавить", self)
+        add_button.clicked.connect(self.add_to_watchlist)
+        add_layout.addWidget(add_button)
+        layout.addLayout(add_layout)
+
+        reload_button = QPushButton("Перечитать списки", self)
+        reload_button.clicked.connect(self.reload_watchlists)
+        layout.addWidget(reload_button)
+
+        layout.addWidget(QLabel("Срабатывания:", self))
+        self.alerts_list = QListWidget(self)
+        layout.addWidget(self.alerts_list)
+        self.update_lists_summary()
+
+    def add_to_watchlist(self):
+        list_name = self.list_name_combo.currentText().strip()
+        plate = self.list_plate_edit.text().strip()
+        if not list_name or not plate:
+            return
+        self.watchlist.add(list_name, plate)
+        self.list_plate_edit.clear()
+        self.reload_watchlists()
+
+    def reload_watchlists(self):
+        self.watchlist.reload()
+        self.update_lists_summary()
+
+    def update_lists_summary(self):
+        lists = self.watchlist.lists
+        summary = ", ".join(f"{name}: {count}" for name, count in lists.items())
+        self.lists_summary_label.setText(
+            f"Списки в {self.watchlist.directory}: {summary}" if summary else f"Нет списков в {self.watchlist.directory}"
+        )
+        current = self.list_name_combo.currentText()
+        self.list_name_combo.clear()
+        self.list_name_combo.addItems(list(lists) or ["black"])
+        if current:
+            self.list_name_combo.setCurrentText(current)
+
     def init_settings_tab(self):
         layout = QVBoxLayout(self.settings_tab)
         self.settings_tab_widget = QTabWidget(self)
@@ -136,6 +406,10 @@ class MainWindow(QMainWindow):
         self.init_channels_settings_tab()
         self.settings_tab_widget.addTab(self.channels_settings_tab, "Настройки каналов")
 
+        self.metrics_tab = QWidget()
+        self.init_metrics_tab()
+        self.settings_tab_widget.addTab(self.metrics_tab, "Производительность")
+
         save_button = QPushButton("Сохранить настройки", self)
         save_button.clicked.connect(self.save_settings)
         layout.addWidget(save_button)
@@ -146,6 +420,50 @@ class MainWindow(QMainWindow):
         self.interval_edit.setText(str(self.config["plate_image_send_interval"]))
         layout.addRow("Отправка изображения каждые (кадров):", self.interval_edit)
 
+    def init_metrics_tab(self):
+        layout = QVBoxLayout(self.metrics_tab)
+        metrics_config = self.config.get("metrics", {})
+        if metrics_config.get("enabled"):
+            endpoint = f"http://{metrics_config.get('host')}:{metrics_config.get('port')}/metrics"
+            layout.addWidget(QLabel(f"Метрики Prometheus: {endpoint}", self))
+        self.metrics_label = QLabel(self)
+        self.metrics_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        self.metrics_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.metrics_label, 1)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.metrics_timer.start(2000)
+
+    def update_metrics(self):
+        if not self.metrics_tab.isVisible():
+            return
+        if self.config.get("workers", {}).get("enabled"):
+            self.metrics_label.setText("Каналы обрабатываются в отдельных процессах: смотрите их метрики на следующих портах.")
+            return
+        fps = {dict(key).get("channel"): value for key, value in METRICS.values("plate_channel_fps").items()}
+        levels = {dict(key).get("channel"): value for key, value in METRICS.values("plate_degradation_level").items()}
+        lookups = {}
+        for key, value in METRICS.values("plate_crop_cache_lookups_total").items():
+            labels = dict(key)
+            lookups.setdefault(labels["channel"], {})[labels["result"]] = value
+        stages = {}
+        for key, histogram in METRICS.histograms("plate_stage_seconds").items():
+            labels = dict(key)
+            stages.setdefault(labels["channel"], []).append((labels["stage"], histogram))
+        lines = []
+        for channel in sorted(stages):
+            title = f"Канал {int(channel) + 1}" if channel.isdigit() else channel
+            lines.append(f"{title}: {fps.get(channel, 0.0):.1f} кадр/с" if channel in fps else f"{title}:")
+            if levels.get(channel):
+                lines.append(f"    деградация: {DEGRADATION_LEVELS[int(levels[channel])]}")
+            if channel in lookups:
+                hits, total = lookups[channel].get("hit", 0.0), sum(lookups[channel].values())
+                lines.append(f"    кэш кропов OCR: {hits / total:.0%} попаданий из {total:.0f}")
+            for stage, histogram in sorted(stages[channel]):
+                mean = histogram.sum / histogram.count * 1000 if histogram.count else 0.0
+                lines.append(f"    {stage}: среднее {mean:.1f} мс, p95 ≤ {histogram.quantile(0.95) * 1000:g} мс")
+        self.metrics_label.setText("\n".join(lines) or "Нет данных")
+
     def init_channels_settings_tab(self):
         layout = QVBoxLayout(self.channels_settings_tab)
 
@@ -156,15 +474,34 @@ class MainWindow(QMainWindow):
         layout.addLayout(form_layout)
 
         self.video_path_edits = []
+        self.roi_edits = []
+        self.imgsz_edits = []
         for i in range(10):
             video_path_edit = QLineEdit(self)
             video_path_edit.setReadOnly(True)
             video_path_edit.mousePressEvent = lambda event, idx=i: self.select_video(event, idx)
             self.video_path_edits.append(video_path_edit)
-            form_layout.addRow(f"Путь к видео для канала {i + 1}:", video_path_edit)
 
-        for i, path in enumerate(self.config["video_paths"]):
+            roi_edit = QLineEdit(self)
+            roi_edit.setPlaceholderText("ROI: x1,y1,x2,y2 (доли кадра)")
+            self.roi_edits.append(roi_edit)
+
+            imgsz_edit = QLineEdit(self)
+            imgsz_edit.setPlaceholderText("Вход детектора, px")
+            imgsz_edit.setFixedWidth(120)
+            self.imgsz_edits.append(imgsz_edit)
+
+            row_layout = QHBoxLayout()
+            row_layout.addWidget(video_path_edit, 3)
+            row_layout.addWidget(roi_edit, 2)
+            row_layout.addWidget(imgsz_edit)
+            form_layout.addRow(f"Путь к видео для канала {i + 1}:", row_layout)
+
+        for i, path in enumerate(self.config["video_paths"][:10]):
+            settings = get_channel_settings(self.config, i)
             self.video_path_edits[i].setText(path)
+            self.roi_edits[i].setText(format_roi(settings["roi"]))
+            self.imgsz_edits[i].setText(str(settings["imgsz"] or ""))
 
     def select_video(self, event, index: int):
         self.stop_processing()
@@ -182,7 +519,13 @@ class MainWindow(QMainWindow):
     def save_settings(self):
         new_interval = self.interval_edit.text()
         new_channel_count = self.channel_count_edit.text()
-        new_video_paths = [edit.text() for edit in self.video_path_edits if edit.text()]
+        new_video_paths = []
+        new_channel_settings = []
+        for i, edit in enumerate(self.video_path_edits):
+            if not edit.text():
+                continue
+            new_video_paths.append(edit.text())
+            new_channel_settings.append(self._read_channel_settings(i))
 
         if new_interval.isdigit():
             self.config["plate_image_send_interval"] = int(new_interval)
@@ -191,10 +534,22 @@ class MainWindow(QMainWindow):
             channel_count = int(new_channel_count)
             if 0 < channel_count <= 10:
                 self.config["video_paths"] = new_video_paths[:channel_count]
+                self.config["channel_settings"] = new_channel_settings[:channel_count]
                 self.start_processing()
 
         save_config(self.config_path, self.config)
 
+    def _read_channel_settings(self, index: int) -> dict:
+        settings = get_channel_settings(self.config, index)
+        try:
+            settings["roi"] = parse_roi(self.roi_edits[index].text())
+        except ValueError as exc:
+            print(f"Invalid ROI for channel {index + 1}, keeping the previous one: {exc}")
+        imgsz = self.imgsz_edits[index].text().strip()
+        if imgsz.isdigit() and int(imgsz) > 0:
+            settings["imgsz"] = int(imgsz)
+        return settings
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,148 @@
+"""Background writing of debug and audit images with a bounded queue and a disk quota."""
+from __future__ import annotations
+
+import collections
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Deque, Dict, Mapping, Optional, Tuple
+
+import cv2
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+IMAGE_FORMATS = ("jpg", "webp", "png")
+
+
+class ImageWriter:
+    """Saves images on a background thread so callers never wait for the disk.
+
+    :meth:`submit` copies the images into a queue of at most ``max_queue``
+    entries; when the writer falls behind, the oldest entries are dropped.
+    Only a ``sample_rate`` fraction of submissions is kept. Every submission
+    gets a unique file stem (time, process and counter), and once the
+    directory holds more than ``max_disk_mb`` megabytes the oldest files are
+    deleted.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        image_format: str = "jpg",
+        quality: int = 90,
+        sample_rate: float = 1.0,
+        max_queue: int = 64,
+        max_disk_mb: float = 500.0,
+    ) -> None:
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown image format {image_format!r}, expected one of {IMAGE_FORMATS}")
+        self.directory = Path(directory)
+        self.image_format = image_format
+        self.sample_rate = sample_rate
+        self.max_bytes = int(max_disk_mb * 1024 * 1024)
+        self.dropped = 0
+        self._params = _encode_params(image_format, quality)
+        self._queue: Deque[Tuple[str, Dict[str, np.ndarray]]] = collections.deque(maxlen=max(1, max_queue))
+        self._condition = threading.Condition()
+        self._counter = itertools.count()
+        self._files: Deque[Tuple[Path, int]] = collections.deque()
+        self._disk_bytes = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="image-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, images: Mapping[str, np.ndarray], prefix: str = "") -> bool:
+        """Queue ``images`` to be saved as ``<stem>_<key>.<format>``; returns ``False`` if not sampled."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        stem = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{next(self._counter):06d}"
+        if prefix:
+            stem = f"{prefix}_{stem}"
+        copies = {key: image.copy() for key, image in images.items()}
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append((stem, copies))
+            self._condition.notify()
+        return True
+
+    def close(self) -> None:
+        """Write the queued images and stop the writer thread."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+        if self.dropped:
+            LOGGER.info("Image writer dropped %s submissions to %s", self.dropped, self.directory)
+
+    def _run(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._scan_existing()
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                stem, images = self._queue.popleft()
+            for key, image in images.items():
+                self._write(self.directory / f"{stem}_{key}.{self.image_format}", image)
+
+    def _write(self, path: Path, image: np.ndarray) -> None:
+        try:
+            if not cv2.imwrite(str(path), image, self._params):
+                LOGGER.warning("Failed to write image %s", path)
+                return
+            size = path.stat().st_size
+        except (OSError, cv2.error) as exc:
+            LOGGER.warning("Failed to write image %s: %s", path, exc)
+            return
+        self._files.append((path, size))
+        self._disk_bytes += size
+        while self._disk_bytes > self.max_bytes and len(self._files) > 1:
+            old_path, old_size = self._files.popleft()
+            self._disk_bytes -= old_size
+            try:
+                old_path.unlink()
+            except OSError:
+                pass
+
+    def _scan_existing(self) -> None:
+        """Account for images left by previous runs so the quota covers them too."""
+        existing = []
+        for path in self.directory.glob(f"*.{self.image_format}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            existing.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(existing):
+            self._files.append((path, size))
+            self._disk_bytes += size
+
+
+def _encode_params(image_format: str, quality: int) -> list:
+    if image_format == "jpg":
+        return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if image_format == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    return []
+
+
+def create_image_writer(config: Optional[dict]) -> Optional[ImageWriter]:
+    """Create a writer from a ``debug_images`` config section, or ``None`` when it is disabled."""
+    if not config or not config.get("enabled"):
+        return None
+    return ImageWriter(
+        config["directory"],
+        image_format=config.get("format", "jpg"),
+        quality=config.get("quality", 90),
+        sample_rate=config.get("sample_rate", 1.0),
+        max_queue=config.get("max_queue", 64),
+        max_disk_mb=config.get("max_disk_mb", 500.0),
+    )
@@ -0,0 +1,103 @@
+"""Per-channel load shedding that keeps processing latency within a budget."""
+from __future__ import annotations
+
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+# Degradations in the order they are switched on; every level keeps the ones before it.
+DEGRADATION_LEVELS = ("normal", "skip_render", "idle_detection", "reduced_imgsz", "defer_ocr")
+
+
+class LoadShedder:
+    """Raises or lowers a channel's degradation level from its end-to-end latency.
+
+    The latency of every frame (from decoding to the end of processing) is
+    smoothed with an exponential moving average. While it stays above
+    ``latency_budget_ms`` the level goes up one step at a time, and once it
+    falls below ``recover_ratio`` of the budget it goes back down; at least
+    ``dwell_frames`` frames pass between changes so the effect of a step is
+    measured before the next one. See :data:`DEGRADATION_LEVELS` for what
+    every level turns off.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        latency_budget_ms: float = 500.0,
+        recover_ratio: float = 0.6,
+        dwell_frames: int = 50,
+        smoothing: float = 0.1,
+        render_interval: int = 5,
+        idle_detection_interval: int = 5,
+        reduced_imgsz: int = 416,
+        name: str = "",
+    ) -> None:
+        self.enabled = enabled
+        self.budget = latency_budget_ms / 1000.0
+        self.recover_ratio = recover_ratio
+        self.dwell_frames = dwell_frames
+        self.smoothing = smoothing
+        self.render_interval = max(1, int(render_interval))
+        self.idle_detection_interval = max(1, int(idle_detection_interval))
+        self.reduced_imgsz = reduced_imgsz
+        self.name = name
+        self.level = 0
+        self.latency = 0.0
+        self._frames_at_level = 0
+
+    @property
+    def level_name(self) -> str:
+        return DEGRADATION_LEVELS[self.level]
+
+    @property
+    def skip_render(self) -> bool:
+        return self.level >= DEGRADATION_LEVELS.index("skip_render")
+
+    @property
+    def idle_detection(self) -> bool:
+        return self.level >= DEGRADATION_LEVELS.index("idle_detection")
+
+    @property
+    def reduced_input(self) -> bool:
+        return self.level >= DEGRADATION_LEVELS.index("reduced_imgsz")
+
+    @property
+    def defer_ocr(self) -> bool:
+        return self.level >= DEGRADATION_LEVELS.index("defer_ocr")
+
+    def update(self, latency: float) -> bool:
+        """Account for the latency of one frame in seconds; returns ``True`` if the level changed."""
+        if not self.enabled:
+            return False
+        self.latency = latency if not self.latency else self.latency + self.smoothing * (latency - self.latency)
+        self._frames_at_level += 1
+        if self._frames_at_level < self.dwell_frames:
+            return False
+        if self.latency > self.budget and self.level < len(DEGRADATION_LEVELS) - 1:
+            self.level += 1
+        elif self.latency < self.budget * self.recover_ratio and self.level > 0:
+            self.level -= 1
+        else:
+            return False
+        self._frames_at_level = 0
+        LOGGER.info(
+            "Channel %s: latency %.0f ms, degradation level %s (%s)",
+            self.name,
+            self.latency * 1000,
+            self.level,
+            self.level_name,
+        )
+        return True
+
+    def should_render(self, frame_index: int) -> bool:
+        return not self.skip_render or frame_index % self.render_interval == 0
+
+    def should_detect_idle(self, frame_index: int) -> bool:
+        """Whether a channel without tracks should run detection on this frame."""
+        return not self.idle_detection or frame_index % self.idle_detection_interval == 0
+
+    def detector_input(self, imgsz: int | None) -> int | None:
+        if not self.reduced_input:
+            return imgsz
+        return min(imgsz, self.reduced_imgsz) if imgsz else self.reduced_imgsz
@@ -0,0 +1,240 @@
+"""In-process pipeline metrics exposed in the Prometheus text format."""
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils.config import DEFAULT_CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+# Imported by every entry point early on, so this is close to when the process started.
+PROCESS_START = time.monotonic()
+
+# Upper bounds, in seconds, of the stage timing histogram buckets.
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+SERVER = None
+_SERVER_LOCK = threading.Lock()
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile (the last bound for the overflow bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Thread-safe registry of histograms, counters and gauges keyed by name and labels."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._histograms: Dict[str, Dict[_LabelKey, Histogram]] = {}
+        self._values: Dict[str, Dict[_LabelKey, float]] = {}
+        self._samples: Optional[Dict[str, Dict[_LabelKey, List[float]]]] = None
+
+    def describe(self, name: str, kind: str, text: str) -> None:
+        self._help[name] = (kind, text)
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = STAGE_BUCKETS, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+            if self._samples is not None:
+                self._samples.setdefault(name, {}).setdefault(key, []).append(value)
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._values.setdefault(name, {})[_label_key(labels)] = float(value)
+
+    @contextmanager
+    def time(self, name: str, **labels) -> Iterator[None]:
+        """Observe the duration of the ``with`` block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_samples(self) -> None:
+        """Start keeping every observed value, dropping the ones kept so far.
+
+        Meant for benchmarks that need exact percentiles; memory grows with
+        every observation, so it stays off in the application.
+        """
+        with self._lock:
+            self._samples = {}
+
+    def samples(self, name: str) -> Dict[_LabelKey, List[float]]:
+        """Values observed for ``name`` since :meth:`record_samples`, keyed by their label tuples."""
+        with self._lock:
+            return {key: list(values) for key, values in (self._samples or {}).get(name, {}).items()}
+
+    def histograms(self, name: str) -> Dict[_LabelKey, Histogram]:
+        """Copy of the histograms of ``name`` keyed by their label tuples."""
+        with self._lock:
+            return {key: _copy(histogram) for key, histogram in self._histograms.get(name, {}).items()}
+
+    def values(self, name: str) -> Dict[_LabelKey, float]:
+        with self._lock:
+            return dict(self._values.get(name, {}))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._values.items()):
+                kind, text = self._help.get(name, ("gauge", name))
+                lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{_format_labels(key)} {value:g}" for key, value in sorted(series.items())]
+            for name, series in sorted(self._histograms.items()):
+                _, text = self._help.get(name, ("histogram", name))
+                lines += [f"# HELP {name} {text}", f"# TYPE {name} histogram"]
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', f'{bound:g}'),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+METRICS.describe("plate_stage_seconds", "histogram", "Time spent in a pipeline stage per frame or batch.")
+METRICS.describe("plate_detection_batch_size", "histogram", "Frames per batched detector call.")
+METRICS.describe("plate_detection_queue_depth", "gauge", "Frames waiting for the shared detector.")
+METRICS.describe("plate_capture_queue_depth", "gauge", "Decoded frames waiting to be processed.")
+METRICS.describe("plate_frames_decoded_total", "counter", "Frames decoded from the source.")
+METRICS.describe("plate_frames_dropped_total", "counter", "Stale live-stream frames dropped before processing.")
+METRICS.describe("plate_frames_processed_total", "counter", "Frames that went through the pipeline.")
+METRICS.describe("plate_ocr_crops_total", "counter", "Plate crops sent to OCR.")
+METRICS.describe("plate_crop_cache_lookups_total", "counter", "Plate crops looked up in the OCR result cache, by result.")
+METRICS.describe("plate_channel_fps", "gauge", "Frames processed per second, averaged over a few seconds.")
+METRICS.describe("plate_models_ready_seconds", "gauge", "Time from start-up until the models were loaded and warmed up.")
+METRICS.describe("plate_cold_start_seconds", "gauge", "Time from start-up until the channel processed its first frame.")
+METRICS.describe("plate_degradation_level", "gauge", "Load shedding level of the channel, 0 when nothing is degraded.")
+METRICS.describe("plate_state_entries", "gauge", "Entries of per-channel state such as tracks, trails and OCR caches.")
+METRICS.describe("plate_state_bytes", "gauge", "Memory held by per-channel buffers such as trails and the clip buffer.")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        pass
+
+
+def start_metrics_server(config: dict, port_offset: int = 0) -> Optional[ThreadingHTTPServer]:
+    """Serve ``/metrics`` once per process on ``metrics.port + port_offset`` unless disabled.
+
+    Worker processes pass their number as ``port_offset`` so each of them
+    gets a port of its own.
+    """
+    global SERVER
+    metrics_config = {**DEFAULT_CONFIG["metrics"], **config.get("metrics", {})}
+    if not metrics_config["enabled"]:
+        return None
+    with _SERVER_LOCK:
+        if SERVER is None:
+            address = (metrics_config["host"], int(metrics_config["port"]) + port_offset)
+            try:
+                SERVER = ThreadingHTTPServer(address, _Handler)
+            except OSError as exc:
+                LOGGER.warning("Metrics endpoint disabled, cannot listen on %s:%s: %s", *address, exc)
+                return None
+            threading.Thread(target=SERVER.serve_forever, name="metrics-http", daemon=True).start()
+            LOGGER.info("Serving metrics on http://%s:%s/metrics", *address)
+        return SERVER
+
+
+class RateMeter:
+    """Events per second over a sliding window of about ``window`` seconds."""
+
+    __slots__ = ("window", "_start", "_count", "rate")
+
+    def __init__(self, window: float = 2.0) -> None:
+        self.window = window
+        self._start = time.monotonic()
+        self._count = 0
+        self.rate = 0.0
+
+    def tick(self) -> bool:
+        """Count one event; returns ``True`` when ``rate`` has just been refreshed."""
+        self._count += 1
+        elapsed = time.monotonic() - self._start
+        if elapsed < self.window:
+            return False
+        self.rate = self._count / elapsed
+        self._start += elapsed
+        self._count = 0
+        return True
+
+
+def _label_key(labels: Dict[str, object]) -> _LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: _LabelKey) -> str:
+    if not key:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in key)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
+
+
+def _copy(histogram: Histogram) -> Histogram:
+    copy = Histogram(histogram.buckets)
+    copy.counts = list(histogram.counts)
+    copy.sum = histogram.sum
+    copy.count = histogram.count
+    return copy
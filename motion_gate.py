@@ -0,0 +1,83 @@
+"""Cheap change detection that lets static scenes skip the detector."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class MotionStats:
+    """Counters of a single channel's motion gate."""
+
+    frames: int = 0
+    skipped: int = 0
+
+
+class MotionGate:
+    """Decides whether a frame changed enough to be worth running detection on.
+
+    The frame (or the ``roi`` part of it, given as ``[x1, y1, x2, y2]``
+    fractions of the frame size) is downscaled to ``width`` pixels, blurred
+    and compared with the previous one. Detection is requested when at least
+    ``min_changed_ratio`` of the pixels differ by more than
+    ``pixel_threshold``, and at least once every ``keepalive_frames`` frames
+    so trackers keep getting updates on a static scene.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        width: int = 160,
+        pixel_threshold: int = 25,
+        min_changed_ratio: float = 0.002,
+        keepalive_frames: int = 15,
+        roi: Optional[Sequence[float]] = None,
+    ) -> None:
+        self.enabled = enabled
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.keepalive_frames = max(1, int(keepalive_frames))
+        self.roi = tuple(roi) if roi else None
+        self.stats = MotionStats()
+        self._previous: Optional[np.ndarray] = None
+        self._frames_since_detection = 0
+
+    def reset(self) -> None:
+        self._previous = None
+        self._frames_since_detection = 0
+
+    def needs_detection(self, frame: np.ndarray) -> bool:
+        """Return ``False`` when ``frame`` is close enough to the previous one to skip detection."""
+        self.stats.frames += 1
+        if not self.enabled:
+            return True
+
+        current = self._prepare(frame)
+        changed = self._previous is None or self._previous.shape != current.shape or self._changed(current)
+        self._previous = current
+        if changed or self._frames_since_detection + 1 >= self.keepalive_frames:
+            self._frames_since_detection = 0
+            return True
+        self._frames_since_detection += 1
+        self.stats.skipped += 1
+        return False
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        if self.roi is not None:
+            height, width = frame.shape[:2]
+            x1, y1, x2, y2 = self.roi
+            frame = frame[int(y1 * height) : int(y2 * height), int(x1 * width) : int(x2 * width)]
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.width / max(width, 1))
+        small = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _changed(self, current: np.ndarray) -> bool:
+        diff = cv2.absdiff(current, self._previous)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) >= self.min_changed_ratio * mask.size
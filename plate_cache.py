@@ -0,0 +1,283 @@
+"""Per-track caching and multi-frame voting of OCR results."""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from plate_format import PlateReading
+
+# Cell of the frame a crop's center falls into and its difference hash.
+CropKey = Tuple[int, int, int]
+
+
+class _TrackVotes:
+    __slots__ = (
+        "attempts",
+        "readings",
+        "best_quality",
+        "last_attempt",
+        "last_seen",
+        "char_votes",
+        "length_votes",
+        "length_counts",
+        "region_votes",
+        "text",
+        "region",
+        "char_confidences",
+        "confirmed",
+        "hint",
+    )
+
+    def __init__(self, frame_index: int) -> None:
+        self.attempts = 0
+        self.readings = 0
+        self.best_quality = 0.0
+        self.last_attempt = -1
+        self.last_seen = frame_index
+        self.char_votes: Dict[int, List[Dict[str, float]]] = {}
+        self.length_votes: Dict[int, float] = defaultdict(float)
+        self.length_counts: Dict[int, int] = defaultdict(int)
+        self.region_votes: Dict[str, float] = defaultdict(float)
+        self.text = ""
+        self.region = ""
+        self.char_confidences: List[float] = []
+        self.confirmed = False
+        self.hint = ""
+
+    @property
+    def label(self) -> str:
+        return f"{self.text} {self.region}".strip() or self.hint
+
+    def to_reading(self) -> PlateReading:
+        confidence = sum(self.char_confidences) / len(self.char_confidences) if self.char_confidences else 0.0
+        return PlateReading(self.text, self.region, confidence, list(self.char_confidences))
+
+
+class TrackPlateCache:
+    """Decides when a track needs OCR and merges its readings into one plate.
+
+    A track is recognized on its first frame, then again only when its crop
+    quality improves by ``quality_gain`` or ``retry_interval`` frames have
+    passed, up to ``max_attempts`` times. Readings are combined by summing
+    per-character confidences at every position; once ``min_votes`` readings
+    agree on the plate length and every position's winner holds at least
+    ``min_agreement`` of its votes the track is confirmed and never OCR'd
+    again. Tracks unseen for ``max_idle_frames`` frames are evicted.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        min_votes: int = 3,
+        min_agreement: float = 0.6,
+        retry_interval: int = 5,
+        quality_gain: float = 1.2,
+        max_idle_frames: int = 30,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.min_votes = min_votes
+        self.min_agreement = min_agreement
+        self.retry_interval = retry_interval
+        self.quality_gain = quality_gain
+        self.max_idle_frames = max_idle_frames
+        self._tracks: Dict[int, _TrackVotes] = {}
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def clear(self) -> None:
+        self._tracks.clear()
+
+    def should_recognize(self, track_id: int, quality: float, frame_index: int, first_only: bool = False) -> bool:
+        """Mark the track as seen and return whether its current crop should go through OCR.
+
+        With ``first_only`` tracks that already have a (not yet confirmed)
+        reading are skipped, which defers refining them until load drops.
+        """
+        state = self._tracks.get(track_id)
+        if state is None:
+            state = self._tracks[track_id] = _TrackVotes(frame_index)
+        state.last_seen = frame_index
+
+        if state.confirmed or state.attempts >= self.max_attempts or (first_only and state.text):
+            return False
+        if state.last_attempt < 0 or quality >= state.best_quality * self.quality_gain:
+            recognize = True
+        else:
+            recognize = frame_index - state.last_attempt >= self.retry_interval
+        if recognize:
+            state.best_quality = max(state.best_quality, quality)
+        return recognize
+
+    def add(self, track_id: int, reading: Optional[PlateReading], frame_index: int) -> bool:
+        """Record an OCR attempt for the track; return ``True`` if it has just been confirmed."""
+        state = self._tracks.get(track_id)
+        if state is None:
+            state = self._tracks[track_id] = _TrackVotes(frame_index)
+        if state.confirmed:
+            return False
+        state.attempts += 1
+        state.last_attempt = frame_index
+        if reading is None or not reading.text:
+            return False
+
+        state.readings += 1
+        length = len(reading.text)
+        positions = state.char_votes.setdefault(length, [defaultdict(float) for _ in range(length)])
+        char_confidences = reading.char_confidences or [reading.confidence] * length
+        for position, (char, confidence) in enumerate(zip(reading.text, char_confidences)):
+            positions[position][char] += max(confidence, 1e-3)
+        state.length_votes[length] += max(reading.confidence, 1e-3)
+        state.length_counts[length] += 1
+        state.region_votes[reading.region] += max(reading.confidence, 1e-3)
+
+        best_length = max(state.length_votes, key=state.length_votes.get)
+        best_positions = state.char_votes[best_length]
+        state.text = "".join(max(votes, key=votes.get) for votes in best_positions)
+        state.region = max(state.region_votes, key=state.region_votes.get)
+        readings_for_length = state.length_counts[best_length]
+        state.char_confidences = [min(1.0, max(votes.values()) / readings_for_length) for votes in best_positions]
+
+        agreement = min(max(votes.values()) / sum(votes.values()) for votes in best_positions)
+        if state.length_counts[best_length] >= self.min_votes and agreement >= self.min_agreement:
+            state.confirmed = True
+            return True
+        return False
+
+    def attempted(self, track_id: int) -> bool:
+        """Whether the track has been through OCR or taken a suggested reading already."""
+        state = self._tracks.get(track_id)
+        return state is not None and state.last_attempt >= 0
+
+    def suggest(self, track_id: int, reading: PlateReading, frame_index: int) -> None:
+        """Show ``reading`` for the track until it has a reading of its own.
+
+        The reading does not vote and does not use up an attempt; the track's
+        own OCR follows on the usual retry schedule.
+        """
+        state = self._tracks.get(track_id)
+        if state is None:
+            state = self._tracks[track_id] = _TrackVotes(frame_index)
+        state.hint = reading.label
+        state.last_attempt = frame_index
+
+    def label(self, track_id: int) -> str:
+        state = self._tracks.get(track_id)
+        return state.label if state is not None else ""
+
+    def reading(self, track_id: int) -> Optional[PlateReading]:
+        """Voted plate of the track with the average winning confidence per character."""
+        state = self._tracks.get(track_id)
+        if state is None or not state.text:
+            return None
+        return state.to_reading()
+
+    def is_confirmed(self, track_id: int) -> bool:
+        state = self._tracks.get(track_id)
+        return state is not None and state.confirmed
+
+    def evict(self, frame_index: int) -> List[Tuple[int, PlateReading]]:
+        """Drop idle tracks and return ``(track_id, reading)`` for those that ended without confirmation."""
+        unconfirmed = []
+        for track_id in [
+            track_id
+            for track_id, state in self._tracks.items()
+            if frame_index - state.last_seen > self.max_idle_frames
+        ]:
+            state = self._tracks.pop(track_id)
+            if not state.confirmed and state.text:
+                unconfirmed.append((track_id, state.to_reading()))
+        return unconfirmed
+
+
+class CropReadingCache:
+    """LRU cache of OCR readings for crops that look the same as recently recognized ones.
+
+    Crops are keyed by a difference hash (``hash_size`` x ``hash_size``
+    brightness gradients of the downscaled grayscale crop, insensitive to
+    scale and exposure) and the ``cell_size`` grid cell their center falls
+    into. A lookup matches entries in the same or a neighbouring cell whose
+    hash differs in at most ``max_distance`` bits, so a parked car whose
+    track was lost and found again is not OCR'd anew. Entries expire after
+    ``ttl`` seconds. Only readings that matched a plate pattern are cached:
+    a failed read must not keep a later, sharper crop of the same plate
+    from being OCR'd.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 10.0,
+        hash_size: int = 8,
+        max_distance: int = 4,
+        cell_size: int = 24,
+    ) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.hash_size = hash_size
+        self.max_distance = max_distance
+        self.cell_size = max(1, int(cell_size))
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CropKey, Tuple[PlateReading, float]]" = OrderedDict()
+        self._cells: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._cells.clear()
+
+    def key(self, crop: np.ndarray, center: Tuple[float, float]) -> CropKey:
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        small = cv2.resize(gray, (self.hash_size + 1, self.hash_size), interpolation=cv2.INTER_AREA)
+        bits = np.packbits(small[:, 1:] > small[:, :-1])
+        return int(center[0]) // self.cell_size, int(center[1]) // self.cell_size, int.from_bytes(bits.tobytes(), "big")
+
+    def get(self, key: CropKey, now: Optional[float] = None) -> Optional[PlateReading]:
+        """Return the reading of a cached look-alike of the crop, or ``None``."""
+        now = time.monotonic() if now is None else now
+        cell_x, cell_y, crop_hash = key
+        for x in (cell_x - 1, cell_x, cell_x + 1):
+            for y in (cell_y - 1, cell_y, cell_y + 1):
+                for cached_hash in list(self._cells.get((x, y), ())):
+                    if (cached_hash ^ crop_hash).bit_count() > self.max_distance:
+                        continue
+                    cached_key = (x, y, cached_hash)
+                    reading, expires = self._entries[cached_key]
+                    if expires < now:
+                        self._remove(cached_key)
+                        continue
+                    self._entries.move_to_end(cached_key)
+                    self.hits += 1
+                    return reading
+        self.misses += 1
+        return None
+
+    def put(self, key: CropKey, reading: Optional[PlateReading], now: Optional[float] = None) -> None:
+        if reading is None or not reading.text:
+            return
+        now = time.monotonic() if now is None else now
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        self._entries[key] = (reading, now + self.ttl)
+        self._cells[key[:2]].add(key[2])
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: CropKey) -> None:
+        del self._entries[key]
+        cell = self._cells[key[:2]]
+        cell.discard(key[2])
+        if not cell:
+            del self._cells[key[:2]]
@@ -0,0 +1,139 @@
+"""Structured plate events and the sinks they can be written to."""
+from __future__ import annotations
+
+import json
+import logging
+import socket
+import sys
+import threading
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class PlateEvent:
+    """A plate recognized on a channel."""
+
+    channel: Optional[int]
+    source: str
+    timestamp: float
+    track_id: Optional[int]
+    plate: str
+    region: str
+    confidence: float
+    thumbnail: Optional[str] = None
+    watchlist_hits: List[Dict[str, Any]] = field(default_factory=list)
+    clip: Optional[str] = None
+    crop: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+
+    @property
+    def label(self) -> str:
+        return f"{self.plate} {self.region}".strip()
+
+    @property
+    def alert_text(self) -> str:
+        """Human-readable description of the watchlist hits, empty when there are none."""
+        matches = ", ".join(f"{hit['list_name']}: {hit['plate']}" for hit in self.watchlist_hits)
+        return f"{self.label} ({matches})" if matches else ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable fields of the event; the in-memory ``crop`` is left out."""
+        return {item.name: getattr(self, item.name) for item in fields(self) if item.name != "crop"}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+
+class JsonlSink:
+    """Writes every event as one JSON line to a text stream."""
+
+    def __init__(self, stream: TextIO = sys.stdout) -> None:
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, event: PlateEvent) -> None:
+        self.write(event)
+
+    def write(self, event: PlateEvent) -> None:
+        line = event.to_json() + "\n"
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+    def close(self) -> None:
+        pass
+
+
+class FileSink(JsonlSink):
+    """Appends events as JSON lines to a file."""
+
+    def __init__(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(path.open("a", encoding="utf-8"))
+
+    def close(self) -> None:
+        with self._lock:
+            self.stream.close()
+
+
+class SocketSink(JsonlSink):
+    """Sends events as JSON lines to a local Unix or TCP socket, reconnecting on failure.
+
+    Events produced while the receiving side is unavailable are dropped.
+    """
+
+    def __init__(self, address: str | tuple) -> None:
+        super().__init__(stream=None)
+        self.address = address
+        self._socket: Optional[socket.socket] = None
+
+    def write(self, event: PlateEvent) -> None:
+        data = (event.to_json() + "\n").encode("utf-8")
+        with self._lock:
+            for _ in range(2):
+                try:
+                    if self._socket is None:
+                        self._socket = self._connect()
+                    self._socket.sendall(data)
+                    return
+                except OSError as exc:
+                    LOGGER.warning("Failed to send plate event to %s: %s", self.address, exc)
+                    self._close_socket()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_socket()
+
+    def _connect(self) -> socket.socket:
+        if isinstance(self.address, tuple):
+            return socket.create_connection(self.address, timeout=5)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(5)
+        sock.connect(self.address)
+        return sock
+
+    def _close_socket(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+def create_sink(spec: str) -> JsonlSink:
+    """Create a sink from ``stdout``, ``file:<path>``, ``unix:<path>`` or ``tcp:<host>:<port>``."""
+    kind, _, target = spec.partition(":")
+    if kind == "stdout":
+        return JsonlSink(sys.stdout)
+    if kind == "file" and target:
+        return FileSink(target)
+    if kind == "unix" and target:
+        return SocketSink(target)
+    if kind == "tcp" and target:
+        host, _, port = target.rpartition(":")
+        return SocketSink((host or "127.0.0.1", int(port)))
+    raise ValueError(f"Unknown event sink {spec!r}")
@@ -0,0 +1,206 @@
+"""Normalization of raw OCR text and matching it against plate patterns."""
+from __future__ import annotations
+
+import itertools
+import logging
+import re
+import string
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+
+LOGGER = logging.getLogger(__name__)
+
+# Cyrillic letters that look like Latin ones; plates are matched in the Latin alphabet.
+HOMOGLYPHS = str.maketrans("АВЕКМНОРСТУХ", "ABEKMHOPCTYX")
+# Replacements tried when a character does not fit the class the pattern expects at its position.
+_DIGIT_TO_LETTER = {"0": "O", "1": "I", "2": "Z", "4": "A", "5": "S", "6": "G", "7": "T", "8": "B"}
+_LETTER_TO_DIGIT = {"O": "0", "Q": "0", "D": "0", "I": "1", "L": "1", "Z": "2", "A": "4", "S": "5", "G": "6", "T": "7", "B": "8"}
+_PLATE_CHARS = string.ascii_uppercase + string.digits
+_TOKEN = re.compile(r"(\[[^\]]*\]|\\[dws]|[^\\\[\](){}|*+?.])(\{(\d+)(?:,(\d+))?\}|\?)?")
+MAX_TEMPLATE_VARIANTS = 64
+
+# A template item is either the set of characters allowed at a position or a literal separator.
+_TemplateItem = Union[FrozenSet[str], str]
+
+
+@dataclass
+class PlateReading:
+    """Plate text matched by a pattern together with its OCR confidences."""
+
+    text: str
+    region: str
+    confidence: float
+    char_confidences: List[float]
+
+    @property
+    def label(self) -> str:
+        return f"{self.text} {self.region}".strip()
+
+
+@dataclass
+class PlateMatch:
+    """Normalized plate text, its region and the confidence of every character."""
+
+    plate: str
+    region: str
+    char_confidences: List[float]
+    corrections: int = 0
+
+
+def fold_homoglyphs(text: str) -> str:
+    """Uppercase ``text`` and replace Cyrillic look-alikes with Latin letters."""
+    return text.upper().translate(HOMOGLYPHS)
+
+
+class PlateMatcher:
+    """Matches OCR output against all plate patterns at once.
+
+    The text is uppercased, Cyrillic look-alikes are folded to Latin and
+    punctuation is turned into single spaces. The patterns are compiled once
+    into a single alternation of named groups, so a well-formed reading finds
+    its region in one regex pass. Otherwise the separators are dropped and the
+    remaining characters are fitted to the patterns of the same length
+    position by position: a character outside the class the pattern expects
+    there is swapped for its digit/letter look-alike (``0``/``O``, ``8``/``B``,
+    ...), up to ``max_corrections`` times, and the separators are put back in.
+    """
+
+    def __init__(self, patterns: Sequence[dict], max_corrections: int = 2) -> None:
+        self.max_corrections = max_corrections
+        self.regions = [pattern.get("region", "") for pattern in patterns]
+        alternatives = [
+            f"(?P<p{index}>{_strip_anchors(pattern.get('pattern', ''))})" for index, pattern in enumerate(patterns)
+        ]
+        self._regex = re.compile("|".join(alternatives)) if alternatives else None
+        self._templates: Dict[int, List[Tuple[int, Tuple[_TemplateItem, ...]]]] = {}
+        for index, pattern in enumerate(patterns):
+            templates = _parse_template(pattern.get("pattern", ""))
+            if templates is None:
+                LOGGER.info("Pattern %r is only matched as is, without character correction", pattern.get("pattern"))
+                continue
+            for template in templates:
+                length = sum(1 for item in template if not isinstance(item, str))
+                self._templates.setdefault(length, []).append((index, template))
+
+    def match(self, text: str, char_confidences: Optional[Sequence[float]] = None) -> Optional[PlateMatch]:
+        """Return the normalized plate for ``text``, or ``None`` if it fits no pattern."""
+        if self._regex is None:
+            return None
+        chars, confidences = _clean(text, char_confidences)
+        cleaned = "".join(chars)
+        found = self._regex.fullmatch(cleaned)
+        if found is not None:
+            return PlateMatch(cleaned, self.regions[int(found.lastgroup[1:])], confidences)
+
+        compact = [(char, confidence) for char, confidence in zip(chars, confidences) if char != " "]
+        best: Optional[PlateMatch] = None
+        for index, template in self._templates.get(len(compact), []):
+            candidate = _fit(template, compact, self.max_corrections)
+            if candidate is not None and (best is None or candidate.corrections < best.corrections):
+                candidate.region = self.regions[index]
+                best = candidate
+                if best.corrections == 0:
+                    break
+        return best
+
+
+def _clean(text: str, char_confidences: Optional[Sequence[float]]) -> Tuple[List[str], List[float]]:
+    """Fold ``text`` and collapse everything but letters and digits into single inner spaces."""
+    if not char_confidences or len(char_confidences) != len(text):
+        char_confidences = [1.0] * len(text)
+    chars: List[str] = []
+    confidences: List[float] = []
+    for char, confidence in zip(fold_homoglyphs(text), char_confidences):
+        if char in _PLATE_CHARS:
+            chars.append(char)
+            confidences.append(float(confidence))
+        elif chars and chars[-1] != " ":
+            chars.append(" ")
+            confidences.append(float(confidence))
+    if chars and chars[-1] == " ":
+        chars.pop()
+        confidences.pop()
+    return chars, confidences
+
+
+def _fit(template: Tuple[_TemplateItem, ...], compact: List[Tuple[str, float]], max_corrections: int) -> Optional[PlateMatch]:
+    plate: List[str] = []
+    confidences: List[float] = []
+    corrections = 0
+    position = 0
+    for item in template:
+        if isinstance(item, str):
+            plate.append(item)
+            continue
+        char, confidence = compact[position]
+        position += 1
+        if char not in item:
+            char = (_DIGIT_TO_LETTER if char.isdigit() else _LETTER_TO_DIGIT).get(char, "")
+            corrections += 1
+            if char not in item or corrections > max_corrections:
+                return None
+        plate.append(char)
+        confidences.append(confidence)
+    mean_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    # Separators were not read by the OCR; give them the average confidence so they don't skew it.
+    char_confidences, chars = [], iter(confidences)
+    for item in template:
+        char_confidences.append(mean_confidence if isinstance(item, str) else next(chars))
+    return PlateMatch("".join(plate), "", char_confidences, corrections)
+
+
+def _strip_anchors(pattern: str) -> str:
+    if pattern.startswith("^"):
+        pattern = pattern[1:]
+    if pattern.endswith("$") and not pattern.endswith("\\$"):
+        pattern = pattern[:-1]
+    return pattern
+
+
+def _parse_template(pattern: str) -> Optional[List[Tuple[_TemplateItem, ...]]]:
+    """Expand a simple pattern into fixed-length templates, or ``None`` if it uses unsupported syntax.
+
+    Supported are character classes, ``\\d``, ``\\w``, ``\\s``, literal
+    characters and ``{n}``, ``{n,m}`` or ``?`` quantifiers; literal characters
+    other than letters and digits become separators.
+    """
+    body = _strip_anchors(pattern)
+    slots: List[Tuple[_TemplateItem, int, int]] = []
+    position = 0
+    while position < len(body):
+        token = _TOKEN.match(body, position)
+        if token is None:
+            return None
+        position = token.end()
+        atom, quantifier, low, high = token.groups()
+        if quantifier == "?":
+            low, high = 0, 1
+        elif quantifier:
+            low = int(low)
+            high = int(high) if high is not None else low
+        else:
+            low = high = 1
+        if atom == "\\s" or (len(atom) == 1 and not atom.isalnum()):
+            slots.append((" " if atom == "\\s" else atom, low, high))
+            continue
+        try:
+            regex = re.compile(atom)
+        except re.error:
+            return None
+        allowed = frozenset(char for char in _PLATE_CHARS if regex.fullmatch(char))
+        if not allowed:
+            return None
+        slots.append((allowed, low, high))
+
+    templates = []
+    for counts in itertools.product(*(range(low, high + 1) for _, low, high in slots)):
+        template: List[_TemplateItem] = []
+        for (item, _, _), count in zip(slots, counts):
+            if isinstance(item, str):
+                template.extend([item] if count else [])
+            else:
+                template.extend([item] * count)
+        templates.append(tuple(template))
+        if len(templates) > MAX_TEMPLATE_VARIANTS:
+            return None
+    return templates
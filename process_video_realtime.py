@@ -2,139 +2,547 @@
 from __future__ import annotations
 
 import logging
+import threading
 import time
-from collections import defaultdict
+from dataclasses import asdict
 from pathlib import Path
-from typing import Callable
+from typing import TYPE_CHECKING, Callable
 
 import cv2
 import numpy as np
-from PyQt5.QtGui import QImage
-from ultralytics import YOLO
 
-from recognition_plate import PlateRecognizer
-from utils.config import DEFAULT_CONFIG, load_config
+from clip_recorder import ClipRecorder
+from detection import DetectionScheduler, create_detector
+from event_store import PlateEventStore, get_event_store
+from image_writer import create_image_writer
+from load_shedding import LoadShedder
+from metrics import METRICS, PROCESS_START, RateMeter, start_metrics_server
+from motion_gate import MotionGate
+from plate_cache import CropReadingCache, TrackPlateCache
+from plate_events import PlateEvent
+from plate_format import PlateReading
+from roi import RegionOfInterest
+from tracking import IouTracker, TrackTrails
+from video_capture import FrameGrabber
+from watchlist import Watchlist, get_watchlist
+from utils.config import DEFAULT_CHANNEL_SETTINGS, DEFAULT_CONFIG, get_channel_settings, load_config
+
+if TYPE_CHECKING:
+    from recognition_plate import PlateRecognizer
 
 LOGGER = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-PRETRAINED_MODEL_PATH = Path("models/best.pt")
 CLASS_COLORS = {"licence": (255, 255, 255)}
-MODEL = None
-PLATE_RECOGNIZER = PlateRecognizer(debug_dir=None)
+STATE_LOG_INTERVAL = 3000
+STATE_METRICS_INTERVAL = 50
+SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+PLATE_RECOGNIZER = None
+_RECOGNIZER_LOCK = threading.Lock()
+MODELS_READY = threading.Event()
+_LOADER_STARTED = False
+_LOADER_LOCK = threading.Lock()
+
+
+def _get_scheduler(config: dict) -> DetectionScheduler:
+    """Return the process-wide detection scheduler shared by all channels."""
+    global SCHEDULER
+    with _SCHEDULER_LOCK:
+        if SCHEDULER is None:
+            detection_config = {**DEFAULT_CONFIG["detection"], **config.get("detection", {})}
+            channel_count = max(1, len(config.get("video_paths") or []))
+            sizes = {get_channel_settings(config, index)["imgsz"] for index in range(channel_count)}
+            shedding_config = {**DEFAULT_CONFIG["load_shedding"], **config.get("load_shedding", {})}
+            if shedding_config["enabled"]:
+                # The input size load shedding switches to must not be first seen under load.
+                sizes |= {min(size, shedding_config["reduced_imgsz"]) for size in sizes}
+            SCHEDULER = DetectionScheduler(
+                create_detector(detection_config, warmup_sizes=sorted(sizes)),
+                max_batch_size=detection_config["max_batch_size"],
+                max_wait=detection_config["max_wait_ms"] / 1000.0,
+            )
+        return SCHEDULER
+
+
+def _get_recognizer(config: dict) -> PlateRecognizer:
+    """Return the process-wide plate recognizer shared by all channels."""
+    # EasyOCR and torch are only imported once a real recognizer is needed.
+    from recognition_plate import PlateRecognizer
+
+    global PLATE_RECOGNIZER
+    with _RECOGNIZER_LOCK:
+        if PLATE_RECOGNIZER is None:
+            ocr_config = {**DEFAULT_CONFIG["ocr"], **config.get("ocr", {})}
+            PLATE_RECOGNIZER = PlateRecognizer(
+                image_writer=create_image_writer({**DEFAULT_CONFIG["debug_images"], **config.get("debug_images", {})}),
+                ocr_mode=ocr_config["mode"],
+                max_corrections=ocr_config["max_corrections"],
+                preprocess=ocr_config["preprocess"],
+                target_height=ocr_config["target_height"],
+                sharpness_threshold=ocr_config["sharpness_threshold"],
+                deskew=ocr_config["deskew"],
+            )
+            PLATE_RECOGNIZER.warm_up()
+        return PLATE_RECOGNIZER
+
+
+def start_model_loading(config: dict) -> threading.Event:
+    """Load and warm up the detector and the recognizer concurrently in the background, once per process.
+
+    Returns the event set once both are done (or failed to load; channels
+    then retry and report the error).
+    """
+    global _LOADER_STARTED
+    with _LOADER_LOCK:
+        if not _LOADER_STARTED:
+            _LOADER_STARTED = True
+            threading.Thread(target=_load_models, args=(config,), name="model-loader", daemon=True).start()
+    return MODELS_READY
+
+
+def _load_models(config: dict) -> None:
+    loaders = [
+        threading.Thread(target=_load_model, args=("Detector", _get_scheduler, config), name="load-detector"),
+        threading.Thread(target=_load_model, args=("OCR", _get_recognizer, config), name="load-ocr"),
+    ]
+    for loader in loaders:
+        loader.start()
+    for loader in loaders:
+        loader.join()
+    elapsed = time.monotonic() - PROCESS_START
+    METRICS.set("plate_models_ready_seconds", elapsed)
+    LOGGER.info("Models ready %.2f s after start-up", elapsed)
+    MODELS_READY.set()
+
+
+def _load_model(name: str, loader: Callable[[dict], object], config: dict) -> None:
+    started = time.monotonic()
+    try:
+        loader(config)
+    except Exception as exc:  # noqa: BLE001
+        LOGGER.error("Failed to load the %s model: %s", name, exc)
+        return
+    LOGGER.info("%s loaded and warmed up in %.2f s", name, time.monotonic() - started)
+
+
+class ChannelPipeline:
+    """Per-channel processing state on top of the shared detection scheduler.
+
+    Every channel owns its tracker, so track ids never collide between cameras
+    even though all of them are detected by the same model. Frames the motion
+    gate considers unchanged skip detection and reuse the previous boxes. Only
+    the channel's region of interest is sent to the detector, at the channel's
+    own input size.
+
+    When the channel's frame latency exceeds the configured budget its
+    :class:`LoadShedder` degrades processing step by step: fewer frames are
+    rendered, idle channels detect less often, the detector gets a smaller
+    input and tracks that already have a reading wait with further OCR.
+
+    Event timestamps come from ``clock``, which offline processing replaces
+    with the position in the recording.
+    """
+
+    def __init__(
+        self,
+        scheduler: DetectionScheduler,
+        recognizer: PlateRecognizer,
+        config: dict,
+        text_callback: Callable[[str], None] | None,
+        channel_settings: dict | None = None,
+        event_callback: Callable[[PlateEvent], None] | None = None,
+        channel_index: int | None = None,
+        source: str = "",
+        draw: bool = True,
+        event_store: PlateEventStore | None = None,
+        watchlist: Watchlist | None = None,
+        alert_callback: Callable[[str], None] | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        channel_settings = {**DEFAULT_CHANNEL_SETTINGS, **(channel_settings or {})}
+        self.scheduler = scheduler
+        self.recognizer = recognizer
+        self.event_callback = event_callback
+        self.event_store = event_store
+        self.watchlist = watchlist
+        self.alert_callback = alert_callback
+        self.clock = clock
+        self.channel_index = channel_index
+        self.source = source
+        self.draw = draw
+        self.roi = RegionOfInterest(channel_settings["roi"])
+        self.imgsz = channel_settings["imgsz"]
+        self.text_callback = text_callback
+        self.plate_image_send_interval = config.get(
+            "plate_image_send_interval", DEFAULT_CONFIG["plate_image_send_interval"]
+        )
+        self.tracker = IouTracker(**{**DEFAULT_CONFIG["tracking"], **config.get("tracking", {})})
+        self.plate_cache = TrackPlateCache(**{**DEFAULT_CONFIG["ocr_cache"], **config.get("ocr_cache", {})})
+        crop_cache_config = {**DEFAULT_CONFIG["crop_cache"], **config.get("crop_cache", {})}
+        self.crop_cache = CropReadingCache(**crop_cache_config) if crop_cache_config.pop("enabled") else None
+        motion_config = {**DEFAULT_CONFIG["motion"], **config.get("motion", {})}
+        motion_config["roi"] = motion_config["roi"] or self.roi.bounds
+        self.motion_gate = MotionGate(**motion_config)
+        clip_config = {**DEFAULT_CONFIG["clips"], **config.get("clips", {})}
+        self.clip_trigger = clip_config.pop("trigger")
+        self.clip_recorder = None
+        if clip_config.pop("enabled"):
+            name = f"channel{channel_index + 1}" if channel_index is not None else "channel"
+            self.clip_recorder = ClipRecorder(name=name, **clip_config)
+        self.last_detections = []
+        self.channel_id = scheduler.register()
+        self.trails = TrackTrails(**{**DEFAULT_CONFIG["trails"], **config.get("trails", {})})
+        self.last_recognized_plate = ""
+        self.frame_counter = 0
+        self.metrics_channel = str(channel_index) if channel_index is not None else source
+        self.shedder = LoadShedder(
+            **{**DEFAULT_CONFIG["load_shedding"], **config.get("load_shedding", {})}, name=self.metrics_channel
+        )
+        self.rendering = draw
+
+    def reset(self) -> None:
+        """Drop all per-track state, e.g. after the stream has been reopened."""
+        self.tracker.reset()
+        self.plate_cache.clear()
+        if self.crop_cache is not None:
+            self.crop_cache.clear()
+        self.motion_gate.reset()
+        self.last_detections = []
+        self.trails.clear()
+
+    def close(self) -> None:
+        """Release the scheduler slot and report plates of tracks that were never confirmed."""
+        self.scheduler.unregister(self.channel_id)
+        for track_id, reading in self.plate_cache.evict(self.frame_counter + self.plate_cache.max_idle_frames + 1):
+            self._emit(track_id, reading)
+        if self.clip_recorder is not None:
+            self.clip_recorder.close()
+
+    def state_sizes(self) -> dict:
+        """Entry counts and buffer sizes of the per-channel state, for checking that memory stays flat."""
+        return {
+            "tracks": len(self.tracker),
+            "trails": len(self.trails),
+            "trail_bytes": self.trails.nbytes,
+            "ocr_cache_tracks": len(self.plate_cache),
+            "crop_cache_entries": len(self.crop_cache) if self.crop_cache is not None else 0,
+            "clip_buffer_bytes": self.clip_recorder.buffer_bytes if self.clip_recorder is not None else 0,
+            "degradation_level": self.shedder.level_name,
+        }
 
+    def process_frame(self, frame: np.ndarray) -> None:
+        """Detect, track and recognize plates on ``frame``, drawing the results in place unless ``draw`` is off.
 
-def _load_model() -> YOLO:
-    global MODEL
-    if MODEL is None:
-        if not PRETRAINED_MODEL_PATH.exists():
-            raise FileNotFoundError(f"Model weights not found at {PRETRAINED_MODEL_PATH}")
-        MODEL = YOLO(str(PRETRAINED_MODEL_PATH))
-    return MODEL
+        ``rendering`` tells afterwards whether the frame was drawn on and should be displayed.
+        """
+        self.frame_counter += 1
+        self.rendering = self.draw and self.shedder.should_render(self.frame_counter)
+        started = time.perf_counter()
+        needs_detection = self.motion_gate.needs_detection(frame)
+        if needs_detection and not len(self.tracker):
+            needs_detection = self.shedder.should_detect_idle(self.frame_counter)
+        started = self.observe_stage("motion", started)
+        if needs_detection:
+            region, offset = self.roi.crop(frame)
+            region_rgb = cv2.cvtColor(region, cv2.COLOR_BGR2RGB)
+            started = self.observe_stage("convert", started)
+            imgsz = self.shedder.detector_input(self.imgsz)
+            detections = self.roi.to_frame(self.scheduler.detect(self.channel_id, region_rgb, imgsz), offset)
+            detections = self.tracker.update(detections)
+            self.observe_stage("detect", started)
+            plate_labels = self._recognize_plates(frame, [d for d in detections if d.class_name == "licence"])
+            for track_id, reading in self.plate_cache.evict(self.frame_counter):
+                self._emit(track_id, reading)
+            if self.draw:
+                self._update_trails(detections)
+            self.last_detections = detections
+        else:
+            detections = self.last_detections
+            plate_labels = {
+                id(detection): self.plate_cache.label(detection.track_id)
+                for detection in detections
+                if detection.class_name == "licence"
+            }
+
+        if self.frame_counter % self.plate_image_send_interval == 0:
+            for recognized_text in plate_labels.values():
+                LOGGER.info("Frame %s: recognized plate %s", self.frame_counter, recognized_text)
+        if self.clip_recorder is not None:
+            # Before drawing: clips are evidence and keep the raw frame; add_frame copies it.
+            # Stamped with the clock events use, so the pre/post window lines up with trigger().
+            self.clip_recorder.add_frame(frame, self.clock())
+        if self.rendering:
+            started = time.perf_counter()
+            self._draw(frame, detections, plate_labels)
+            self.observe_stage("draw", started)
+        if self.draw:
+            self.trails.evict(self.frame_counter)
+        if self.frame_counter % STATE_METRICS_INTERVAL == 0:
+            self._export_state_sizes()
+
+    def observe_latency(self, latency: float) -> None:
+        """Feed the time from decoding to the end of processing of the last frame to the load shedder."""
+        METRICS.observe("plate_stage_seconds", latency, channel=self.metrics_channel, stage="total")
+        if self.shedder.update(latency):
+            METRICS.set("plate_degradation_level", self.shedder.level, channel=self.metrics_channel)
+
+    def observe_stage(self, stage: str, started: float) -> float:
+        """Record the time since ``started`` for ``stage`` and return the current time."""
+        now = time.perf_counter()
+        METRICS.observe("plate_stage_seconds", now - started, channel=self.metrics_channel, stage=stage)
+        return now
+
+    def _export_state_sizes(self) -> None:
+        sizes = self.state_sizes()
+        if self.frame_counter % STATE_LOG_INTERVAL == 0:
+            LOGGER.info("Source %s: per-channel state %s", self.source, sizes)
+        for name, value in sizes.items():
+            if name.endswith("_bytes"):
+                METRICS.set("plate_state_bytes", value, channel=self.metrics_channel, state=name[: -len("_bytes")])
+            elif isinstance(value, int):
+                METRICS.set("plate_state_entries", value, channel=self.metrics_channel, state=name)
+
+    def _update_trails(self, detections: list) -> None:
+        # Only frames that went through the detector move the trails; reused boxes would repeat the last point.
+        for detection in detections:
+            if detection.class_name == "licence" and detection.track_id is not None:
+                center = (int((detection.x1 + detection.x2) / 2), int((detection.y1 + detection.y2) / 2))
+                self.trails.update(detection.track_id, center, self.frame_counter)
+
+    def _draw(self, frame: np.ndarray, detections: list, plate_labels: dict) -> None:
+        for detection in detections:
+            x1, y1, x2, y2 = detection.x1, detection.y1, detection.x2, detection.y2
+            class_name = detection.class_name
+            confidence = detection.confidence
+            track_id = detection.track_id
+
+            color = CLASS_COLORS.get(class_name, (0, 255, 0))
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(
+                frame,
+                f"{class_name} {confidence:.2f}",
+                (x1, y1 - 10),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                color,
+                2,
+            )
+
+            if class_name == "licence":
+                recognized_text = plate_labels[id(detection)]
+                cv2.putText(frame, recognized_text, (x1, y1 - 25), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+
+                if track_id is not None:
+                    points = self.trails.points(track_id)
+                    if len(points):
+                        cv2.polylines(frame, [points.reshape((-1, 1, 2))], isClosed=False, color=color, thickness=2)
+
+    def _recognize_plates(self, frame: np.ndarray, detections: list) -> dict:
+        """OCR the plate crops whose tracks need it in one batch and return labels keyed by ``id(detection)``.
+
+        The first crop of a track that looks like one recognized shortly
+        before at the same place takes the cached reading instead of going
+        through OCR. That reading is only shown until the track has readings
+        of its own: it does not vote, and the track's retries always go
+        through OCR.
+        """
+        started = time.perf_counter()
+        pending, crops = [], []
+        for detection in detections:
+            plate_image = frame[max(detection.y1, 0) : detection.y2, max(detection.x1, 0) : detection.x2]
+            if plate_image.size == 0:
+                continue
+            first_attempt = not self.plate_cache.attempted(detection.track_id)
+            if not self.plate_cache.should_recognize(
+                detection.track_id, _crop_quality(plate_image), self.frame_counter, first_only=self.shedder.defer_ocr
+            ):
+                continue
+            key = None
+            if self.crop_cache is not None:
+                center = ((detection.x1 + detection.x2) / 2, (detection.y1 + detection.y2) / 2)
+                key = self.crop_cache.key(plate_image, center)
+            if key is not None and first_attempt:
+                reading = self.crop_cache.get(key)
+                METRICS.inc(
+                    "plate_crop_cache_lookups_total",
+                    channel=self.metrics_channel,
+                    result="miss" if reading is None else "hit",
+                )
+                if reading is not None:
+                    self.plate_cache.suggest(detection.track_id, reading, self.frame_counter)
+                    continue
+            pending.append((detection, plate_image, key))
+            crops.append(self.recognizer.preprocess_image(plate_image))
+
+        if crops:
+            started = self.observe_stage("preprocess", started)
+            texts = self.recognizer.read_batch(crops)
+            started = self.observe_stage("ocr", started)
+            readings = self.recognizer.match_batch(texts)
+            self.observe_stage("pattern", started)
+            METRICS.inc("plate_ocr_crops_total", len(crops), channel=self.metrics_channel)
+            for (detection, plate_image, key), reading in zip(pending, readings):
+                if key is not None:
+                    self.crop_cache.put(key, reading)
+                if self.plate_cache.add(detection.track_id, reading, self.frame_counter):
+                    self._emit(detection.track_id, self.plate_cache.reading(detection.track_id), plate_image)
+        return {id(detection): self.plate_cache.label(detection.track_id) for detection in detections}
+
+    def _emit(self, track_id: int | None, reading: PlateReading | None, plate_image: np.ndarray | None = None) -> None:
+        if reading is None or not reading.label or reading.label == self.last_recognized_plate:
+            return
+        self.last_recognized_plate = reading.label
+        if self.text_callback is not None:
+            self.text_callback(reading.label)
+        timestamp = self.clock()
+        hits = self.watchlist.match(reading.text) if self.watchlist is not None else []
+        clip = None
+        if self.clip_recorder is not None and (self.clip_trigger == "plate" or hits):
+            clip = self.clip_recorder.trigger(reading.label, timestamp)
+        if self.event_callback is None and self.event_store is None and not hits:
+            return
+        event = PlateEvent(
+            channel=self.channel_index,
+            source=self.source,
+            timestamp=timestamp,
+            track_id=track_id,
+            plate=reading.text,
+            region=reading.region,
+            confidence=reading.confidence,
+            watchlist_hits=[asdict(hit) for hit in hits],
+            clip=clip,
+            # The frame is drawn on right after recognition, keep the crop clean for the thumbnail.
+            crop=plate_image.copy() if plate_image is not None and self.event_store is not None else None,
+        )
+        if hits:
+            LOGGER.warning("Watchlist alert on %s: %s", self.source, event.alert_text)
+            if self.alert_callback is not None:
+                self.alert_callback(event.alert_text)
+        if self.event_store is not None:
+            self.event_store.add(event)
+        if self.event_callback is not None:
+            self.event_callback(event)
 
 
 def process_video_realtime(
     video_path: str,
-    frame_callback: Callable[[QImage], None],
-    text_callback: Callable[[str], None],
+    frame_callback: Callable[[np.ndarray], None] | None,
+    text_callback: Callable[[str], None] | None,
     config_path: str | Path = "config.yaml",
+    stop_event: threading.Event | None = None,
+    channel_index: int | None = None,
+    event_callback: Callable[[PlateEvent], None] | None = None,
+    alert_callback: Callable[[str], None] | None = None,
 ) -> None:
-    """Process a video file frame-by-frame and emit frames and recognized text."""
-    config = load_config(config_path)
-    plate_image_send_interval = config.get("plate_image_send_interval", DEFAULT_CONFIG["plate_image_send_interval"])
+    """Process a video file frame-by-frame and emit annotated BGR frames and recognized text.
+
+    Processing runs until the source ends or ``stop_event`` is set.
+    ``channel_index`` selects the channel's entry in ``channel_settings``.
+    Without ``frame_callback`` nothing is drawn on the frames; structured
+    :class:`PlateEvent` objects go to ``event_callback`` and, unless disabled
+    in the config, to the shared :class:`PlateEventStore`. Plates found on a
+    watchlist are additionally reported to ``alert_callback``.
 
-    track_history = defaultdict(list)
-    last_plate_position = {}
-    last_recognized_plate = ""
+    Decoding starts right away; until the models are loaded (see
+    :func:`start_model_loading`) frames of live streams are passed to
+    ``frame_callback`` unprocessed, while recordings wait for them.
+    """
+    stop_event = stop_event or threading.Event()
+    config = load_config(config_path)
+    start_metrics_server(config)
+    models_ready = start_model_loading(config)
 
+    pipeline = None
+    grabber = None
     try:
-        model = _load_model()
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            LOGGER.error("Could not open video file %s", video_path)
-            return
+        channel = str(channel_index) if channel_index is not None else video_path
+        grabber = FrameGrabber(
+            video_path,
+            **{**DEFAULT_CONFIG["capture"], **config.get("capture", {})},
+            on_decode=lambda seconds: METRICS.observe("plate_stage_seconds", seconds, channel=channel, stage="decode"),
+        ).start()
 
-        fps = cap.get(cv2.CAP_PROP_FPS) or 30
-        frame_delay = 1.0 / fps if fps else 0
-
-        frame_counter = 0
-        while True:
-            start_time = time.time()
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_counter += 1
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = model.track(frame_rgb, persist=True)
-
-            for result in results:
-                boxes = result.boxes.cpu().numpy()
-                for box in boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].astype(int)
-                    class_id = int(box.cls[0])
-                    class_name = model.names[class_id]
-                    confidence = float(box.conf[0])
-                    track_id = int(box.id[0]) if box.id is not None else None
-
-                    color = CLASS_COLORS.get(class_name, (0, 255, 0))
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                    cv2.putText(
-                        frame,
-                        f"{class_name} {confidence:.2f}",
-                        (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.6,
-                        color,
-                        2,
-                    )
-
-                    if class_name == "licence":
-                        plate_image = frame[y1:y2, x1:x2]
-                        preprocessed_image = PLATE_RECOGNIZER.preprocess_image(plate_image)
-                        recognized_text = PLATE_RECOGNIZER.recognize_plate(preprocessed_image)
-
-                        if recognized_text and recognized_text != last_recognized_plate:
-                            text_callback(recognized_text)
-                            last_recognized_plate = recognized_text
-
-                        cv2.putText(frame, recognized_text, (x1, y1 - 25), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
-
-                        if track_id is not None:
-                            _update_track(track_history, track_id, x1, x2, y1, y2, frame, color)
-                            current_position = (int((x1 + x2) / 2), int((y1 + y2) / 2))
-                            if last_plate_position.get(track_id) != current_position:
-                                last_plate_position[track_id] = current_position
-
-                        if frame_counter % plate_image_send_interval == 0:
-                            LOGGER.info("Frame %s: recognized plate %s", frame_counter, recognized_text)
-
-            frame_for_gui = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            height, width, channel = frame_for_gui.shape
-            bytes_per_line = 3 * width
-            q_img = QImage(frame_for_gui.data, width, height, bytes_per_line, QImage.Format_RGB888)
-            frame_callback(q_img)
-
-            _sync_with_fps(frame_delay, start_time)
-
-        cap.release()
-    except Exception as exc:  # noqa: BLE001
-        LOGGER.error("Error during video processing: %s", exc)
+        fps_meter = RateMeter()
+        reconnects = 0
+        while not stop_event.is_set():
+            frame = grabber.read(timeout=0.5)
+            if frame is None:
+                if grabber.finished:
+                    break
+                continue
+            if pipeline is None:
+                if not models_ready.is_set() and grabber.is_live:
+                    if frame_callback is not None:
+                        frame_callback(frame)
+                    continue
+                # Recordings wait for the models instead, so none of their frames go unprocessed.
+                while not stop_event.is_set() and not models_ready.wait(0.5):
+                    continue
+                if not models_ready.is_set():
+                    break
+                pipeline = ChannelPipeline(
+                    _get_scheduler(config),
+                    _get_recognizer(config),
+                    config,
+                    text_callback,
+                    get_channel_settings(config, channel_index),
+                    event_callback=event_callback,
+                    channel_index=channel_index,
+                    source=video_path,
+                    draw=frame_callback is not None,
+                    event_store=get_event_store(config),
+                    watchlist=get_watchlist(config),
+                    alert_callback=alert_callback,
+                )
+                METRICS.set("plate_degradation_level", pipeline.shedder.level, channel=channel)
+                reconnects = grabber.stats.reconnects
+            if grabber.stats.reconnects != reconnects:
+                reconnects = grabber.stats.reconnects
+                pipeline.reset()
 
+            pipeline.process_frame(frame)
+            if pipeline.frame_counter == 1:
+                cold_start = time.monotonic() - PROCESS_START
+                METRICS.set("plate_cold_start_seconds", cold_start, channel=channel)
+                LOGGER.info("Source %s: first frame processed %.2f s after start-up", video_path, cold_start)
+            if frame_callback is not None and pipeline.rendering:
+                started = time.perf_counter()
+                frame_callback(frame)
+                pipeline.observe_stage("emit", started)
+            pipeline.observe_latency(time.monotonic() - grabber.last_timestamp)
 
-def _update_track(track_history, track_id, x1, x2, y1, y2, frame, color):
-    track = track_history[track_id]
-    current_position = (int((x1 + x2) / 2), int((y1 + y2) / 2))
-    track.append(current_position)
-    if len(track) > 30:
-        track.pop(0)
-    points = np.hstack(track).astype(np.int32).reshape((-1, 1, 2))
-    cv2.polylines(frame, [points], isClosed=False, color=color, thickness=2)
+            METRICS.set("plate_capture_queue_depth", grabber.pending, channel=channel)
+            METRICS.set("plate_frames_decoded_total", grabber.stats.decoded, channel=channel)
+            METRICS.set("plate_frames_dropped_total", grabber.stats.dropped, channel=channel)
+            METRICS.set("plate_frames_processed_total", grabber.stats.processed, channel=channel)
+            if fps_meter.tick():
+                METRICS.set("plate_channel_fps", fps_meter.rate, channel=channel)
+    except Exception as exc:  # noqa: BLE001
+        LOGGER.error("Error during video processing: %s", exc)
+    finally:
+        if grabber is not None:
+            grabber.stop()
+            LOGGER.info(
+                "Source %s: decoded %s, dropped %s, processed %s frames, %s reconnects",
+                video_path,
+                grabber.stats.decoded,
+                grabber.stats.dropped,
+                grabber.stats.processed,
+                grabber.stats.reconnects,
+            )
+        if pipeline is not None:
+            pipeline.close()
+            LOGGER.info(
+                "Source %s: detection skipped on %s of %s frames",
+                video_path,
+                pipeline.motion_gate.stats.skipped,
+                pipeline.motion_gate.stats.frames,
+            )
 
 
-def _sync_with_fps(frame_delay: float, start_time: float) -> None:
-    if frame_delay <= 0:
-        return
-    elapsed_time = time.time() - start_time
-    if elapsed_time < frame_delay:
-        time.sleep(frame_delay - elapsed_time)
+def _crop_quality(plate_image: np.ndarray) -> float:
+    """Score a plate crop by its area and sharpness so larger, crisper crops are OCR'd first."""
+    gray = cv2.cvtColor(plate_image, cv2.COLOR_BGR2GRAY)
+    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+    return float(gray.shape[0] * gray.shape[1] * sharpness)
@@ -2,20 +2,45 @@
 from __future__ import annotations
 
 import logging
+import math
 import re
+import string
+import threading
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional, Sequence, Tuple
 
 import cv2
 import easyocr
+import numpy as np
+import torch
 import yaml
 
+from image_writer import ImageWriter
+from metrics import METRICS
+from plate_format import PlateMatcher, PlateReading
+
 LOGGER = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+OCR_MODES = ("detect", "recognize")
+PREPROCESS_PROFILES = ("adaptive", "legacy")
+_ALLOWLIST_CANDIDATES = string.ascii_letters + string.digits + " "
+MAX_LINE_WIDTH_RATIO = 12
+
 
 class PlateRecognizer:
-    """Encapsulates plate preprocessing and text recognition logic."""
+    """Encapsulates plate preprocessing and text recognition logic.
+
+    ``ocr_mode="detect"`` runs EasyOCR's full pipeline, including its CRAFT
+    text detector. ``ocr_mode="recognize"`` treats the crop, already localized
+    by YOLO, as the text region and feeds it straight to the recognition
+    network, restricted to the characters allowed by the plate patterns.
+
+    ``preprocess="adaptive"`` scales every crop to ``target_height`` pixels
+    and only denoises crops blurrier than ``sharpness_threshold``, so the cost
+    per crop does not depend on the plate size; ``preprocess="legacy"`` keeps
+    the original 3x upscale with a bilateral filter.
+    """
 
     def __init__(
         self,
@@ -23,11 +48,35 @@ class PlateRecognizer:
         languages: Iterable[str] | None = None,
         use_gpu: bool = False,
         debug_dir: Path | None = None,
+        image_writer: ImageWriter | None = None,
+        ocr_mode: str = "detect",
+        max_corrections: int = 2,
+        preprocess: str = "adaptive",
+        target_height: int = 96,
+        sharpness_threshold: float = 150.0,
+        deskew: bool = False,
     ) -> None:
+        if ocr_mode not in OCR_MODES:
+            raise ValueError(f"Unknown OCR mode {ocr_mode!r}, expected one of {OCR_MODES}")
+        if preprocess not in PREPROCESS_PROFILES:
+            raise ValueError(f"Unknown preprocessing profile {preprocess!r}, expected one of {PREPROCESS_PROFILES}")
         self.patterns_path = Path(patterns_path)
         self.debug_dir = Path(debug_dir) if debug_dir else None
+        if image_writer is None and self.debug_dir is not None:
+            image_writer = ImageWriter(self.debug_dir, image_format="png")
+        self.image_writer = image_writer
+        self.ocr_mode = ocr_mode
+        self.preprocess = preprocess
+        self.target_height = target_height
+        self.sharpness_threshold = sharpness_threshold
+        self.deskew = deskew
+        # Scratch buffers are per thread: channels preprocess their crops concurrently.
+        self._scratch = threading.local()
         self.reader = self._create_reader(languages, use_gpu)
         self.patterns = self._load_patterns()
+        self.matcher = PlateMatcher(self.patterns, max_corrections)
+        self.allowlist = _pattern_allowlist(self.patterns)
+        self._ignore_indices = self._blocked_indices()
 
     def _create_reader(self, languages: Iterable[str] | None, use_gpu: bool) -> easyocr.Reader:
         languages = list(languages) if languages else ["en"]
@@ -37,6 +86,14 @@ class PlateRecognizer:
             LOGGER.warning("Failed to initialize EasyOCR with GPU=%s. Falling back to CPU. Error: %s", use_gpu, exc)
             return easyocr.Reader(languages, gpu=False)
 
+    def _blocked_indices(self) -> List[int]:
+        """Indices of recognizer classes outside the allowlist, suppressed in batched decoding."""
+        if not self.allowlist:
+            return []
+        characters = self.reader.converter.character
+        allowed = set(self.allowlist)
+        return [index for index, char in enumerate(characters) if index > 0 and char not in allowed]
+
     def _load_patterns(self) -> List[dict]:
         if not self.patterns_path.exists():
             LOGGER.warning("Pattern file %s not found. No pattern filtering will be applied.", self.patterns_path)
@@ -49,38 +106,248 @@ class PlateRecognizer:
             LOGGER.warning("No plate patterns found in %s.", self.patterns_path)
         return patterns
 
+    def warm_up(self) -> None:
+        """Run a blank crop through OCR so the first real plate does not pay for lazy initialization."""
+        blank = np.full((self.target_height, self.target_height * 4), 255, dtype=np.uint8)
+        self._ocr(blank, detail=0)
+
     def recognize_plate(self, img_gray) -> str:
         """Recognize a plate number from a preprocessed grayscale image."""
         recognized_text = self.recognize_text(img_gray)
         filtered_text = self.filter_by_pattern(recognized_text)
         return filtered_text
 
+    def read_plate(self, img_gray) -> Optional[PlateReading]:
+        """Recognize a plate and keep the OCR confidences, or return ``None`` if no pattern matches."""
+        return self._to_reading(*self._read_text(img_gray))
+
+    def recognize_batch(self, crops: Sequence[np.ndarray]) -> List[Optional[PlateReading]]:
+        """Recognize many preprocessed plate crops and match them against the plate patterns.
+
+        Crops whose text does not match any pattern yield ``None``. Callers
+        that time OCR and pattern matching separately use :meth:`read_batch`
+        and :meth:`match_batch` instead.
+        """
+        return self.match_batch(self.read_batch(crops))
+
+    def read_batch(self, crops: Sequence[np.ndarray]) -> List[Tuple[str, List[float]]]:
+        """Raw OCR text and per-character confidences of many preprocessed crops in one forward pass.
+
+        Every crop is split into text lines, all lines are resized to the
+        recognizer's input height, right-padded to a common width and decoded
+        together. The result keeps the order of ``crops``. In ``detect`` mode
+        the crops are read one by one, as the text detector cannot be batched.
+        """
+        if self.ocr_mode == "detect":
+            return [self._read_text(crop) for crop in crops]
+
+        lines, owners = [], []
+        for index, crop in enumerate(crops):
+            if crop.ndim == 3:
+                crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            if crop.size == 0:
+                continue
+            for x_min, x_max, y_min, y_max in split_text_lines(crop):
+                lines.append(crop[y_min:y_max, x_min:x_max])
+                owners.append(index)
+
+        texts = [""] * len(crops)
+        confidences: List[List[float]] = [[] for _ in crops]
+        with METRICS.time("plate_stage_seconds", channel="shared", stage="ocr_batch"):
+            recognized = self._recognize_lines(lines)
+        for owner, (text, char_confidences) in zip(owners, recognized):
+            texts[owner] += text
+            confidences[owner].extend(char_confidences)
+        return list(zip(texts, confidences))
+
+    def match_batch(self, texts: Sequence[Tuple[str, List[float]]]) -> List[Optional[PlateReading]]:
+        """Turn the output of :meth:`read_batch` into plate readings, ``None`` where no pattern matches."""
+        return [self._to_reading(text, char_confidences) for text, char_confidences in texts]
+
+    def _read_text(self, img_gray) -> Tuple[str, List[float]]:
+        results = self._ocr(img_gray, detail=1)
+        text = "".join(result[1] for result in results)
+        return text, [float(result[2]) for result in results for _ in result[1]]
+
+    def _recognize_lines(self, lines: List[np.ndarray]) -> List[Tuple[str, List[float]]]:
+        if not lines:
+            return []
+        height = self.reader.imgH
+        resized = []
+        for line in lines:
+            line_height, line_width = line.shape[:2]
+            width = min(max(1, math.ceil(height * line_width / max(line_height, 1))), height * MAX_LINE_WIDTH_RATIO)
+            resized.append(cv2.resize(line, (width, height), interpolation=cv2.INTER_CUBIC))
+
+        max_width = max(image.shape[1] for image in resized)
+        batch = np.empty((len(resized), 1, height, max_width), dtype=np.float32)
+        for index, image in enumerate(resized):
+            normalized = (image.astype(np.float32) / 255.0 - 0.5) / 0.5
+            width = normalized.shape[1]
+            batch[index, 0, :, :width] = normalized
+            batch[index, 0, :, width:] = normalized[:, -1:]
+
+        with torch.no_grad():
+            preds = self.reader.recognizer(torch.from_numpy(batch).to(self.reader.device), None)
+            probs = preds.softmax(2)
+            if self._ignore_indices:
+                probs[:, :, self._ignore_indices] = 0.0
+                probs = probs / probs.sum(dim=2, keepdim=True).clamp_min(1e-12)
+            best_probs, best_indices = probs.max(dim=2)
+        return [
+            _ctc_greedy_decode(indices, scores, self.reader.converter.character)
+            for indices, scores in zip(best_indices.cpu().numpy(), best_probs.cpu().numpy())
+        ]
+
+    def _to_reading(self, text: str, char_confidences: List[float]) -> Optional[PlateReading]:
+        match = self.matcher.match(text, char_confidences)
+        if match is None:
+            return None
+        confidences = match.char_confidences
+        confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        return PlateReading(match.plate, match.region, confidence, confidences)
+
     def filter_by_pattern(self, text: str) -> str:
-        text = text.upper()
-        for pattern in self.patterns:
-            regex = re.compile(pattern.get("pattern", ""))
-            if regex.match(text):
-                return f"{text} {pattern.get('region', '')}".strip()
-        return ""
+        match = self.match_pattern(text)
+        if match is None:
+            return ""
+        return f"{match[0]} {match[1]}".strip()
+
+    def match_pattern(self, text: str) -> Optional[Tuple[str, str]]:
+        """Return the normalized ``(plate, region)`` for ``text``, see :class:`PlateMatcher`."""
+        match = self.matcher.match(text)
+        if match is None:
+            return None
+        return match.plate, match.region
 
     def preprocess_image(self, img):
         """Resize, denoise and convert the image to grayscale for OCR."""
-        self._save_debug_image(img, "debug_original_image.png")
+        if self.preprocess == "legacy":
+            img_gray = self._preprocess_legacy(img)
+        else:
+            img_gray = self._preprocess_adaptive(img)
 
+        if self.image_writer is not None:
+            self.image_writer.submit({"original": img, "preprocessed": img_gray}, prefix="plate")
+        return img_gray
+
+    def _preprocess_legacy(self, img):
         resized = cv2.resize(img, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
         img_gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
         img_gray = cv2.convertScaleAbs(img_gray, alpha=1.5, beta=0)
-        img_gray = cv2.bilateralFilter(img_gray, 9, 75, 75)
+        return cv2.bilateralFilter(img_gray, 9, 75, 75)
+
+    def _preprocess_adaptive(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        height, width = gray.shape[:2]
+        scale = self.target_height / max(height, 1)
+        size = (max(1, round(width * scale)), self.target_height)
+        interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+        resized = cv2.resize(gray, size, dst=self._buffer("resized", (size[1], size[0]), np.uint8), interpolation=interpolation)
+        if self.deskew:
+            resized = deskew_plate(resized)
+        img_gray = cv2.convertScaleAbs(resized, alpha=1.5, beta=0)
 
-        self._save_debug_image(img_gray, "debug_preprocessed_image.png")
+        laplacian = cv2.Laplacian(img_gray, cv2.CV_16S, dst=self._buffer("laplacian", img_gray.shape, np.int16))
+        _, deviation = cv2.meanStdDev(laplacian)
+        if float(deviation[0][0]) ** 2 < self.sharpness_threshold:
+            img_gray = cv2.bilateralFilter(img_gray, 5, 50, 50)
         return img_gray
 
+    def _buffer(self, name: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+        """Return a reusable per-thread array, reallocated only when the crop width changes."""
+        buffer = getattr(self._scratch, name, None)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=dtype)
+            setattr(self._scratch, name, buffer)
+        return buffer
+
     def recognize_text(self, img_gray) -> str:
-        results = self.reader.readtext(img_gray, detail=0)
+        results = self._ocr(img_gray, detail=0)
         return "".join(results)
 
-    def _save_debug_image(self, img, filename: str) -> None:
-        if not self.debug_dir:
-            return
-        self.debug_dir.mkdir(parents=True, exist_ok=True)
-        cv2.imwrite(str(self.debug_dir / filename), img)
+    def _ocr(self, img_gray, detail: int) -> list:
+        if self.ocr_mode == "detect":
+            return self.reader.readtext(img_gray, detail=detail)
+        return self.reader.recognize(
+            img_gray,
+            horizontal_list=split_text_lines(img_gray),
+            free_list=[],
+            allowlist=self.allowlist,
+            detail=detail,
+        )
+
+
+def split_text_lines(img_gray, min_line_height: int = 8, max_gap_ink: float = 0.15) -> List[List[int]]:
+    """Return EasyOCR ``[x_min, x_max, y_min, y_max]`` boxes for the text rows of a plate crop.
+
+    The crop is split in two when the horizontal ink projection has a clear
+    gap in its middle part, which is how two-row plates look; otherwise the
+    whole crop is a single line.
+    """
+    height, width = img_gray.shape[:2]
+    whole = [[0, width, 0, height]]
+    if height < 2 * min_line_height:
+        return whole
+
+    _, binary = cv2.threshold(img_gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    profile = binary.sum(axis=1) / 255.0
+    low, high = int(height * 0.3), int(height * 0.7)
+    if high <= low or profile.max() <= 0:
+        return whole
+    split = low + int(profile[low:high].argmin())
+    if profile[split] > max_gap_ink * profile.max():
+        return whole
+    if split < min_line_height or height - split < min_line_height:
+        return whole
+    return [[0, width, 0, split], [0, width, split, height]]
+
+
+def deskew_plate(img_gray, max_angle: float = 15.0):
+    """Rotate a grayscale plate crop so its text is horizontal.
+
+    The angle is estimated from the minimum-area rectangle around the dark
+    pixels; crops tilted by less than a degree or more than ``max_angle`` are
+    returned unchanged.
+    """
+    _, binary = cv2.threshold(img_gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    points = cv2.findNonZero(binary)
+    if points is None or len(points) < 10:
+        return img_gray
+    angle = cv2.minAreaRect(points)[-1]
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    if abs(angle) < 1.0 or abs(angle) > max_angle:
+        return img_gray
+    height, width = img_gray.shape[:2]
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(img_gray, rotation, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def _ctc_greedy_decode(indices: np.ndarray, scores: np.ndarray, characters: Sequence[str]) -> Tuple[str, List[float]]:
+    """Collapse a CTC best path into text, keeping the probability of every emitted character."""
+    chars, char_confidences = [], []
+    previous = 0
+    for index, score in zip(indices, scores):
+        index = int(index)
+        if index != 0 and index != previous:
+            chars.append(characters[index])
+            char_confidences.append(float(score))
+        previous = index
+    return "".join(chars), char_confidences
+
+
+def _pattern_allowlist(patterns: List[dict]) -> Optional[str]:
+    """Collect every character that can appear in a plate according to ``patterns``."""
+    allowed = set()
+    for pattern in patterns:
+        regex = re.sub(r"\{\d+(,\d*)?\}", "", pattern.get("pattern", ""))
+        for token in re.findall(r"\[[^\]]*\]|\\[dw]|[A-Za-z0-9 ]", regex):
+            try:
+                token_regex = re.compile(token)
+            except re.error:
+                continue
+            allowed.update(char for char in _ALLOWLIST_CANDIDATES if token_regex.fullmatch(char))
+    return "".join(sorted(allowed)) or None
@@ -0,0 +1,114 @@
+"""Per-channel regions of interest for detection."""
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from detection import Detection
+
+
+class RegionOfInterest:
+    """Part of the frame sent to the detector.
+
+    ``roi`` is either a rectangle ``[x1, y1, x2, y2]`` or a polygon
+    ``[[x, y], ...]``, both in fractions of the frame size. Frames are cropped
+    to the bounding rectangle (pixels outside a polygon are blanked) and the
+    detections are mapped back to full-frame coordinates.
+    """
+
+    def __init__(self, roi: Optional[Sequence] = None) -> None:
+        self.polygon = _to_polygon(roi) if roi else None
+        self._mask: Optional[np.ndarray] = None
+        self._mask_key: Optional[Tuple[int, int]] = None
+
+    @property
+    def bounds(self) -> Optional[Tuple[float, float, float, float]]:
+        """Bounding rectangle of the region as ``(x1, y1, x2, y2)`` fractions."""
+        if self.polygon is None:
+            return None
+        xs = [point[0] for point in self.polygon]
+        ys = [point[1] for point in self.polygon]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def crop(self, frame: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Return the region of ``frame`` and the ``(x, y)`` offset of its top-left corner."""
+        if self.polygon is None:
+            return frame, (0, 0)
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = self._pixel_bounds(width, height)
+        region = frame[y1:y2, x1:x2]
+        if not _is_rectangle(self.polygon):
+            region = cv2.bitwise_and(region, region, mask=self._polygon_mask(width, height))
+        return region, (x1, y1)
+
+    @staticmethod
+    def to_frame(detections: List[Detection], offset: Tuple[int, int]) -> List[Detection]:
+        """Shift detections found on a cropped region back to frame coordinates."""
+        offset_x, offset_y = offset
+        if offset_x or offset_y:
+            for detection in detections:
+                detection.x1 += offset_x
+                detection.x2 += offset_x
+                detection.y1 += offset_y
+                detection.y2 += offset_y
+        return detections
+
+    def _pixel_bounds(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        x1, y1, x2, y2 = self.bounds
+        left, top = int(max(0.0, x1) * width), int(max(0.0, y1) * height)
+        right, bottom = int(min(1.0, x2) * width), int(min(1.0, y2) * height)
+        return left, top, max(right, left + 1), max(bottom, top + 1)
+
+    def _polygon_mask(self, width: int, height: int) -> np.ndarray:
+        if self._mask is None or self._mask_key != (width, height):
+            x1, y1, x2, y2 = self._pixel_bounds(width, height)
+            points = np.array(
+                [[int(x * width) - x1, int(y * height) - y1] for x, y in self.polygon], dtype=np.int32
+            )
+            self._mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+            cv2.fillPoly(self._mask, [points], 255)
+            self._mask_key = (width, height)
+        return self._mask
+
+
+def parse_roi(text: str) -> Optional[List]:
+    """Parse ``"x1,y1,x2,y2"`` or ``"x1 y1; x2 y2; x3 y3"`` into a config value.
+
+    Raises ``ValueError`` when the text is not a valid region.
+    """
+    text = text.strip()
+    if not text:
+        return None
+    if ";" in text:
+        points = [[float(value) for value in point.replace(",", " ").split()] for point in text.split(";") if point.strip()]
+        if len(points) < 3 or any(len(point) != 2 for point in points):
+            raise ValueError(f"Polygon ROI needs at least three 'x y' points: {text!r}")
+        return points
+    values = [float(value) for value in text.replace(",", " ").split()]
+    if len(values) != 4 or values[0] >= values[2] or values[1] >= values[3]:
+        raise ValueError(f"Rectangle ROI must be 'x1,y1,x2,y2' with x1 < x2 and y1 < y2: {text!r}")
+    return values
+
+
+def format_roi(roi: Optional[Sequence]) -> str:
+    """Inverse of :func:`parse_roi`."""
+    if not roi:
+        return ""
+    if isinstance(roi[0], (list, tuple)):
+        return "; ".join(f"{x:g} {y:g}" for x, y in roi)
+    return ",".join(f"{value:g}" for value in roi)
+
+
+def _to_polygon(roi: Sequence) -> List[Tuple[float, float]]:
+    if isinstance(roi[0], (list, tuple)):
+        return [(float(x), float(y)) for x, y in roi]
+    x1, y1, x2, y2 = (float(value) for value in roi)
+    return [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+
+
+def _is_rectangle(polygon: List[Tuple[float, float]]) -> bool:
+    xs = {point[0] for point in polygon}
+    ys = {point[1] for point in polygon}
+    return len(polygon) == 4 and len(xs) == 2 and len(ys) == 2
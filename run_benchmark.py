@@ -0,0 +1,258 @@
+"""Throughput and latency benchmark of the channel pipeline with real or stub models."""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import resource
+import sys
+import threading
+import time
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from detection import Detection, DetectionScheduler
+from metrics import METRICS
+from plate_format import PlateReading
+from utils.config import DEFAULT_CONFIG, load_config
+
+LOGGER = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+
+
+class StubDetector:
+    """Stands in for YOLO: returns plates sliding across the frame after a fixed delay per frame.
+
+    Boxes move by ``step`` pixels per call and wrap around, so tracks keep
+    appearing and disappearing and OCR keeps being exercised.
+    """
+
+    def __init__(self, plates_per_frame: int = 2, delay_ms: float = 0.0, step: int = 12) -> None:
+        self.plates_per_frame = plates_per_frame
+        self.delay = delay_ms / 1000.0
+        self.step = step
+        self._calls = 0
+
+    def detect(self, frames: Sequence[np.ndarray], imgsz: Optional[int] = None) -> List[List[Detection]]:
+        if self.delay:
+            time.sleep(self.delay * len(frames))
+        self._calls += 1
+        return [self._boxes(frame.shape[0], frame.shape[1]) for frame in frames]
+
+    def _boxes(self, height: int, width: int) -> List[Detection]:
+        plate_width, plate_height = max(8, width // 10), max(4, height // 25)
+        boxes = []
+        for lane in range(self.plates_per_frame):
+            x1 = (self._calls * self.step + lane * width // 3) % max(1, width - plate_width)
+            y1 = int(height * (0.4 + 0.5 * lane / max(1, self.plates_per_frame))) % max(1, height - plate_height)
+            boxes.append(Detection(x1, y1, x1 + plate_width, y1 + plate_height, 0.9, "licence"))
+        return boxes
+
+
+class StubRecognizer:
+    """Stands in for EasyOCR: grayscale preprocessing and a fixed reading after a delay per crop."""
+
+    def __init__(self, delay_ms: float = 0.0, text: str = "A123BC77", region: str = "RU") -> None:
+        self.delay = delay_ms / 1000.0
+        self.reading = PlateReading(text, region, 0.9, [0.9] * len(text))
+
+    def preprocess_image(self, img: np.ndarray) -> np.ndarray:
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    def read_batch(self, crops: Sequence[np.ndarray]) -> List[Tuple[str, List[float]]]:
+        if self.delay:
+            time.sleep(self.delay * len(crops))
+        return [(self.reading.text, self.reading.char_confidences) for _ in crops]
+
+    def match_batch(self, texts: Sequence[Tuple[str, List[float]]]) -> List[Optional[PlateReading]]:
+        return [self.reading for _ in texts]
+
+
+def synthetic_frames(width: int, height: int, seed: int = 0) -> Iterator[np.ndarray]:
+    """Endless frames of a fixed noisy background with a moving bright block, so the motion gate passes them."""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    background = cv2.GaussianBlur(background, (0, 0), 3)
+    index = 0
+    while True:
+        frame = background.copy()
+        x = (index * 16) % max(1, width - width // 8)
+        cv2.rectangle(frame, (x, height // 3), (x + width // 8, height // 3 + height // 8), (255, 255, 255), -1)
+        index += 1
+        yield frame
+
+
+def recorded_frames(path: str, width: int, height: int, count: int) -> Iterator[np.ndarray]:
+    """Endlessly cycle the first ``count`` frames of a recording, resized to the benchmark resolution.
+
+    Frames are decoded up front so decoding does not count towards the pipeline.
+    """
+    capture = cv2.VideoCapture(path)
+    frames = []
+    try:
+        while len(frames) < count:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA))
+    finally:
+        capture.release()
+    if not frames:
+        raise SystemExit(f"Cannot read frames from {path}")
+    while True:
+        yield from frames
+
+
+def run_benchmark(
+    config_path: str = "config.yaml",
+    channels: int = 4,
+    width: int = 1920,
+    height: int = 1080,
+    frames: int = 500,
+    warmup: int = 20,
+    detector: str = "stub",
+    ocr: str = "stub",
+    detector_delay_ms: float = 20.0,
+    ocr_delay_ms: float = 5.0,
+    video: Optional[str] = None,
+    seed: int = 0,
+) -> dict:
+    """Run ``channels`` pipelines for ``frames`` frames each after ``warmup`` frames and return the report."""
+    from process_video_realtime import ChannelPipeline, _get_recognizer, _get_scheduler
+
+    config = load_config(config_path)
+    # Measure the pipeline as configured, not the degraded one.
+    config["load_shedding"] = {**config.get("load_shedding", {}), "enabled": False}
+    config["clips"] = {**config.get("clips", {}), "enabled": False}
+    detection_config = {**DEFAULT_CONFIG["detection"], **config.get("detection", {})}
+    if detector == "stub":
+        scheduler = DetectionScheduler(
+            StubDetector(delay_ms=detector_delay_ms),
+            max_batch_size=detection_config["max_batch_size"],
+            max_wait=detection_config["max_wait_ms"] / 1000.0,
+        )
+    else:
+        scheduler = _get_scheduler(config)
+    recognizer = StubRecognizer(delay_ms=ocr_delay_ms) if ocr == "stub" else _get_recognizer(config)
+
+    state = {}
+
+    def start_measuring() -> None:
+        METRICS.record_samples()
+        state["ocr_crops"] = sum(METRICS.values("plate_ocr_crops_total").values())
+        state["started"] = time.perf_counter()
+
+    barrier = threading.Barrier(channels, action=start_measuring)
+
+    def run_channel(index: int) -> None:
+        source = recorded_frames(video, width, height, 100) if video else synthetic_frames(width, height, seed + index)
+        pipeline = ChannelPipeline(scheduler, recognizer, config, None, channel_index=index, source=f"bench{index}", draw=False)
+        try:
+            for number in range(warmup + frames):
+                if number == warmup:
+                    barrier.wait()
+                frame = next(source)
+                started = time.perf_counter()
+                pipeline.process_frame(frame)
+                pipeline.observe_stage("frame", started)
+        except Exception:
+            # Don't leave the other channels waiting for this one at the barrier.
+            barrier.abort()
+            raise
+        finally:
+            pipeline.close()
+
+    threads = [threading.Thread(target=run_channel, args=(index,), name=f"bench-{index}") for index in range(channels)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - state["started"]
+    if detector == "stub":
+        scheduler.stop()
+
+    stages = {}
+    for key, values in METRICS.samples("plate_stage_seconds").items():
+        stages.setdefault(dict(key)["stage"], []).extend(values)
+    batch_sizes = [size for values in METRICS.samples("plate_detection_batch_size").values() for size in values]
+    ocr_crops = sum(METRICS.values("plate_ocr_crops_total").values()) - state["ocr_crops"]
+    total_frames = channels * frames
+    return {
+        "settings": {
+            "channels": channels,
+            "resolution": [width, height],
+            "frames_per_channel": frames,
+            "warmup_frames": warmup,
+            "detector": detector,
+            "ocr": ocr,
+            "detector_delay_ms": detector_delay_ms if detector == "stub" else None,
+            "ocr_delay_ms": ocr_delay_ms if ocr == "stub" else None,
+            "video": video,
+            "seed": seed,
+        },
+        "duration_s": round(duration, 3),
+        "frames_per_s": round(total_frames / duration, 2),
+        "frames_per_s_per_channel": round(total_frames / duration / channels, 2),
+        "ocr_crops_per_s": round(ocr_crops / duration, 2),
+        "ocr_batches_per_s": round(len(stages.get("ocr", [])) / duration, 2),
+        "mean_detection_batch_size": round(float(np.mean(batch_sizes)), 2) if batch_sizes else 0.0,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "stages_ms": {stage: _summary(values) for stage, values in sorted(stages.items())},
+    }
+
+
+def _summary(values: List[float]) -> dict:
+    milliseconds = np.asarray(values) * 1000.0
+    summary = {"count": int(milliseconds.size), "mean": round(float(milliseconds.mean()), 3)}
+    for percentile, value in zip(PERCENTILES, np.percentile(milliseconds, PERCENTILES)):
+        summary[f"p{percentile}"] = round(float(value), 3)
+    return summary
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Benchmark the plate pipeline and print a JSON report.")
+    parser.add_argument("--config", default="config.yaml", help="Path to config.yaml")
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--frames", type=int, default=500, help="Measured frames per channel")
+    parser.add_argument("--warmup", type=int, default=20, help="Frames per channel before measuring")
+    parser.add_argument("--detector", choices=("stub", "real"), default="stub")
+    parser.add_argument("--ocr", choices=("stub", "real"), default="stub")
+    parser.add_argument("--detector-delay-ms", type=float, default=20.0, help="Simulated detector time per frame")
+    parser.add_argument("--ocr-delay-ms", type=float, default=5.0, help="Simulated OCR time per crop")
+    parser.add_argument("--video", default=None, help="Use frames of this recording instead of synthetic ones")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        args.config,
+        channels=args.channels,
+        width=args.width,
+        height=args.height,
+        frames=args.frames,
+        warmup=args.warmup,
+        detector=args.detector,
+        ocr=args.ocr,
+        detector_delay_ms=args.detector_delay_ms,
+        ocr_delay_ms=args.ocr_delay_ms,
+        video=args.video,
+        seed=args.seed,
+    )
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,61 @@
+"""Entry point for running plate recognition as a headless service."""
+from __future__ import annotations
+
+import argparse
+import logging
+import signal
+import threading
+
+from plate_events import create_sink
+from process_video_realtime import process_video_realtime
+from utils.config import DEFAULT_CONFIG, load_config
+
+LOGGER = logging.getLogger(__name__)
+
+
+def run_headless(config_path: str, sink_spec: str | None = None, stop_event: threading.Event | None = None) -> None:
+    """Process every configured video path without a GUI and write plate events to a sink."""
+    config = load_config(config_path)
+    headless_config = {**DEFAULT_CONFIG["headless"], **config.get("headless", {})}
+    sink = create_sink(sink_spec or headless_config["sink"])
+    stop_event = stop_event or threading.Event()
+
+    threads = []
+    for index, video_path in enumerate(config["video_paths"]):
+        if not video_path:
+            continue
+        thread = threading.Thread(
+            target=process_video_realtime,
+            args=(video_path, None, None, config_path, stop_event, index, sink.write),
+            name=f"channel-{index}",
+        )
+        thread.start()
+        threads.append(thread)
+
+    if not threads:
+        LOGGER.warning("No video paths configured in %s", config_path)
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        sink.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run plate recognition without the GUI.")
+    parser.add_argument("--config", default="config.yaml", help="Path to config.yaml")
+    parser.add_argument(
+        "--sink",
+        default=None,
+        help="Where to write plate events: stdout, file:<path>, unix:<path> or tcp:<host>:<port>",
+    )
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    run_headless(args.config, args.sink, stop)
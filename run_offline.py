@@ -0,0 +1,266 @@
+"""Offline processing of recordings as fast as the CPU allows, split into chunks across processes."""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import cv2
+
+from utils.config import DEFAULT_CONFIG, load_config
+
+LOGGER = logging.getLogger(__name__)
+
+VIDEO_SUFFIXES = (".mp4", ".avi", ".mkv", ".mov", ".ts", ".m4v", ".webm")
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """Frames ``[start, end)`` of a recording plus ``overlap`` frames on both sides."""
+
+    path: str
+    start: int
+    end: Optional[int]
+    fps: float
+    overlap: int
+
+    @property
+    def key(self) -> str:
+        stat = Path(self.path).stat()
+        return f"{self.path}|{stat.st_size}|{int(stat.st_mtime)}|{self.start}|{self.end}"
+
+    @property
+    def seconds(self) -> float:
+        return (self.end - self.start) / self.fps if self.end is not None else 0.0
+
+
+def find_videos(inputs: Iterable[str | Path]) -> List[Path]:
+    """Expand directories into the video files they contain, keeping files as given."""
+    videos = []
+    for item in map(Path, inputs):
+        if item.is_dir():
+            videos.extend(sorted(path for path in item.rglob("*") if path.suffix.lower() in VIDEO_SUFFIXES))
+        elif item.is_file():
+            videos.append(item)
+        else:
+            LOGGER.warning("Input %s does not exist", item)
+    return videos
+
+
+def plan_chunks(path: Path, chunk_seconds: float, overlap_seconds: float) -> List[Chunk]:
+    """Split a recording into chunks of about ``chunk_seconds`` that can be decoded independently.
+
+    Files whose length cannot be read are processed as a single chunk.
+    """
+    capture = cv2.VideoCapture(str(path))
+    try:
+        if not capture.isOpened():
+            LOGGER.warning("Cannot open %s", path)
+            return []
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        capture.release()
+    overlap = int(overlap_seconds * fps)
+    if frame_count <= 0:
+        return [Chunk(str(path), 0, None, fps, overlap)]
+    chunk_frames = max(1, int(chunk_seconds * fps))
+    return [
+        Chunk(str(path), start, min(start + chunk_frames, frame_count), fps, overlap)
+        for start in range(0, frame_count, chunk_frames)
+    ]
+
+
+def process_chunk(chunk: Chunk, config_path: str) -> List[dict]:
+    """Run the pipeline over one chunk and return its plate events with timestamps relative to the recording.
+
+    Tracks crossing a chunk boundary are seen whole by the chunk that
+    decodes the overlap past its end; the resulting duplicates are dropped
+    by :func:`deduplicate`.
+    """
+    from process_video_realtime import ChannelPipeline, _get_recognizer, _get_scheduler
+    from watchlist import get_watchlist
+
+    config = _offline_config(config_path)
+    events: List[dict] = []
+    first = max(0, chunk.start - chunk.overlap)
+    last = chunk.end + chunk.overlap if chunk.end is not None else None
+    frame_index = first
+
+    def clock() -> float:
+        return frame_index / chunk.fps
+
+    pipeline = ChannelPipeline(
+        _get_scheduler(config),
+        _get_recognizer(config),
+        config,
+        None,
+        event_callback=lambda event: events.append(event.to_dict()),
+        source=chunk.path,
+        draw=False,
+        watchlist=get_watchlist(config),
+        clock=clock,
+    )
+    capture = cv2.VideoCapture(chunk.path)
+    try:
+        if first:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, first)
+        while last is None or frame_index < last:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            pipeline.process_frame(frame)
+            frame_index += 1
+    finally:
+        capture.release()
+        pipeline.close()
+    return events
+
+
+def deduplicate(events: Sequence[dict], window: float) -> List[dict]:
+    """Merge readings of the same plate in the same recording less than ``window`` seconds apart.
+
+    The first event of a run is kept with the best confidence of the run.
+    """
+    kept: List[dict] = []
+    latest: Dict[Tuple[str, str], Tuple[dict, float]] = {}
+    for event in sorted(events, key=lambda item: (item["source"], item["timestamp"])):
+        key = (event["source"], event["plate"])
+        previous = latest.get(key)
+        if previous is not None and event["timestamp"] - previous[1] <= window:
+            first, _ = previous
+            if event["confidence"] > first["confidence"]:
+                first["confidence"] = event["confidence"]
+                first["region"] = event["region"]
+            latest[key] = (first, event["timestamp"])
+            continue
+        event = dict(event)
+        kept.append(event)
+        latest[key] = (event, event["timestamp"])
+    return kept
+
+
+def load_checkpoint(path: Path) -> Dict[str, List[dict]]:
+    """Events of the chunks finished by a previous run, keyed by :attr:`Chunk.key`."""
+    finished: Dict[str, List[dict]] = {}
+    if not path.exists():
+        return finished
+    with path.open("r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be cut short if the previous run was killed while writing it.
+                continue
+            finished[entry["chunk"]] = entry["events"]
+    return finished
+
+
+def run_offline(
+    inputs: Sequence[str],
+    output: str | Path,
+    config_path: str = "config.yaml",
+    workers: Optional[int] = None,
+    checkpoint: str | Path | None = None,
+    resume: bool = True,
+) -> List[dict]:
+    """Process recordings in parallel chunks and write deduplicated plate events as JSON lines to ``output``.
+
+    Finished chunks are appended to ``checkpoint`` (``<output>.checkpoint.jsonl``
+    by default), so an interrupted run picks up where it stopped.
+    """
+    offline_config = {**DEFAULT_CONFIG["offline"], **load_config(config_path).get("offline", {})}
+    output = Path(output)
+    checkpoint = Path(checkpoint) if checkpoint else output.with_name(f"{output.name}.checkpoint.jsonl")
+    workers = workers or offline_config["workers"] or os.cpu_count() or 1
+
+    chunks = [
+        chunk
+        for path in find_videos(inputs)
+        for chunk in plan_chunks(path, offline_config["chunk_seconds"], offline_config["overlap_seconds"])
+    ]
+    finished = load_checkpoint(checkpoint) if resume else {}
+    if not resume and checkpoint.exists():
+        checkpoint.unlink()
+    keys = {chunk: chunk.key for chunk in chunks}
+    pending = [chunk for chunk in chunks if keys[chunk] not in finished]
+    LOGGER.info("%s chunks to process, %s already done, %s workers", len(pending), len(chunks) - len(pending), workers)
+
+    started = time.monotonic()
+    video_seconds = 0.0
+    checkpoint.parent.mkdir(parents=True, exist_ok=True)
+    context = mp.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(workers,)
+    ) as pool, checkpoint.open("a", encoding="utf-8") as checkpoint_file:
+        futures = {pool.submit(process_chunk, chunk, config_path): chunk for chunk in pending}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                events = future.result()
+            except Exception as exc:  # noqa: BLE001
+                LOGGER.error("Chunk %s of %s failed: %s", chunk.start, chunk.path, exc)
+                continue
+            finished[keys[chunk]] = events
+            checkpoint_file.write(json.dumps({"chunk": keys[chunk], "events": events}, ensure_ascii=False) + "\n")
+            checkpoint_file.flush()
+            video_seconds += chunk.seconds
+            elapsed = time.monotonic() - started
+            LOGGER.info(
+                "Finished %s frames %s-%s: %s events, %.1fx real time overall",
+                chunk.path,
+                chunk.start,
+                chunk.end,
+                len(events),
+                video_seconds / elapsed if elapsed > 0 else 0.0,
+            )
+
+    done: Set[str] = {keys[chunk] for chunk in chunks}
+    events = deduplicate(
+        [event for key, chunk_events in finished.items() if key in done for event in chunk_events],
+        offline_config["dedup_seconds"],
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w", encoding="utf-8") as file:
+        for event in events:
+            file.write(json.dumps(event, ensure_ascii=False) + "\n")
+    LOGGER.info("Wrote %s plate events to %s", len(events), output)
+    return events
+
+
+def _offline_config(config_path: str) -> dict:
+    """The config with everything that only makes sense for live channels turned off."""
+    config = load_config(config_path)
+    config["load_shedding"] = {**config.get("load_shedding", {}), "enabled": False}
+    config["clips"] = {**config.get("clips", {}), "enabled": False}
+    return config
+
+
+def _init_worker(workers: int) -> None:
+    import torch
+
+    logging.basicConfig(level=logging.INFO)
+    # Chunks already run in parallel; let every process use its share of the cores only.
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    cv2.setNumThreads(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Process recordings offline and write deduplicated plate events.")
+    parser.add_argument("inputs", nargs="+", help="Video files or directories with recordings")
+    parser.add_argument("--output", default="data/offline_events.jsonl", help="JSON lines file for the events")
+    parser.add_argument("--config", default="config.yaml", help="Path to config.yaml")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: offline.workers or all cores)")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <output>.checkpoint.jsonl)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and process everything again")
+    args = parser.parse_args()
+
+    run_offline(args.inputs, args.output, args.config, args.workers, args.checkpoint, resume=not args.restart)
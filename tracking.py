@@ -0,0 +1,167 @@
+"""Lightweight per-channel object tracking on top of shared detections."""
+from __future__ import annotations
+
+from typing import Dict, List
+
+import numpy as np
+
+from detection import Detection
+
+
+class _Track:
+    __slots__ = ("box", "class_name", "misses")
+
+    def __init__(self, box: np.ndarray, class_name: str) -> None:
+        self.box = box
+        self.class_name = class_name
+        self.misses = 0
+
+
+class _Trail:
+    __slots__ = ("points", "count", "last_seen")
+
+    def __init__(self, length: int) -> None:
+        self.points = np.zeros((length, 2), dtype=np.int32)
+        self.count = 0
+        self.last_seen = 0
+
+
+class TrackTrails:
+    """Recent center points of every track, kept for drawing their trails.
+
+    Each track holds a fixed ``length`` x 2 array, so a trail never grows, and
+    tracks not updated for ``max_idle_frames`` frames are evicted; the memory
+    used is bounded by the number of tracks alive at the same time.
+    """
+
+    def __init__(self, length: int = 30, max_idle_frames: int = 30) -> None:
+        self.length = max(2, int(length))
+        self.max_idle_frames = max_idle_frames
+        self._trails: Dict[int, _Trail] = {}
+
+    def __len__(self) -> int:
+        return len(self._trails)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the point arrays of all trails."""
+        return sum(trail.points.nbytes for trail in self._trails.values())
+
+    def clear(self) -> None:
+        self._trails.clear()
+
+    def update(self, track_id: int, point: tuple, frame_index: int) -> np.ndarray:
+        """Append ``point`` to the track's trail and return its points, oldest first."""
+        trail = self._trails.get(track_id)
+        if trail is None:
+            trail = self._trails[track_id] = _Trail(self.length)
+        if trail.count == self.length:
+            trail.points[:-1] = trail.points[1:]
+            trail.points[-1] = point
+        else:
+            trail.points[trail.count] = point
+            trail.count += 1
+        trail.last_seen = frame_index
+        return trail.points[: trail.count]
+
+    def points(self, track_id: int) -> np.ndarray:
+        """Points of the track's trail, oldest first; empty for unknown tracks."""
+        trail = self._trails.get(track_id)
+        return trail.points[: trail.count] if trail is not None else np.empty((0, 2), dtype=np.int32)
+
+    def evict(self, frame_index: int) -> int:
+        """Drop trails of tracks not updated for ``max_idle_frames`` frames and return how many."""
+        stale = [
+            track_id
+            for track_id, trail in self._trails.items()
+            if frame_index - trail.last_seen > self.max_idle_frames
+        ]
+        for track_id in stale:
+            del self._trails[track_id]
+        return len(stale)
+
+
+class IouTracker:
+    """Assigns stable track ids to the detections of a single channel.
+
+    Detections are matched greedily to existing tracks of the same class by
+    IoU. Tracks that go unmatched for more than ``max_age`` frames are dropped
+    and at most ``max_tracks`` tracks are kept, so the state stays bounded no
+    matter how long the stream runs.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 30, max_tracks: int = 256) -> None:
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.max_tracks = max_tracks
+        self._tracks: Dict[int, _Track] = {}
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def reset(self) -> None:
+        """Forget all tracks, e.g. after the stream has been reopened."""
+        self._tracks.clear()
+        self._next_id = 1
+
+    def update(self, detections: List[Detection]) -> List[Detection]:
+        """Set ``track_id`` on every detection of the current frame and return them."""
+        track_ids = list(self._tracks)
+        boxes = np.array([[d.x1, d.y1, d.x2, d.y2] for d in detections], dtype=np.float32).reshape(-1, 4)
+        matched_tracks = set()
+        matched_detections = set()
+
+        if track_ids and detections:
+            track_boxes = np.stack([self._tracks[track_id].box for track_id in track_ids])
+            iou = _iou_matrix(boxes, track_boxes)
+            for det_index, detection in enumerate(detections):
+                for track_index, track_id in enumerate(track_ids):
+                    if self._tracks[track_id].class_name != detection.class_name:
+                        iou[det_index, track_index] = 0.0
+            for flat_index in np.argsort(iou, axis=None)[::-1]:
+                det_index, track_index = np.unravel_index(flat_index, iou.shape)
+                if iou[det_index, track_index] < self.iou_threshold:
+                    break
+                if det_index in matched_detections or track_index in matched_tracks:
+                    continue
+                track_id = track_ids[track_index]
+                track = self._tracks[track_id]
+                track.box = boxes[det_index]
+                track.misses = 0
+                detections[det_index].track_id = track_id
+                matched_detections.add(det_index)
+                matched_tracks.add(track_index)
+
+        for track_index, track_id in enumerate(track_ids):
+            if track_index in matched_tracks:
+                continue
+            track = self._tracks[track_id]
+            track.misses += 1
+            if track.misses > self.max_age:
+                del self._tracks[track_id]
+
+        for det_index, detection in enumerate(detections):
+            if det_index in matched_detections:
+                continue
+            detection.track_id = self._next_id
+            self._tracks[self._next_id] = _Track(boxes[det_index], detection.class_name)
+            self._next_id += 1
+
+        if len(self._tracks) > self.max_tracks:
+            stale = sorted(self._tracks, key=lambda track_id: self._tracks[track_id].misses, reverse=True)
+            for track_id in stale[: len(self._tracks) - self.max_tracks]:
+                del self._tracks[track_id]
+        return detections
+
+
+def _iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-6), 0.0)
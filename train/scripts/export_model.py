@@ -0,0 +1,122 @@
+"""Export the trained plate detector for CPU inference with ONNX Runtime or OpenVINO.
+
+Examples::
+
+    python train/scripts/export_model.py --format onnx
+    python train/scripts/export_model.py --format onnx --int8 --calibration-images data/calibration
+    python train/scripts/export_model.py --format openvino --int8 --data train/train_config/train_model_config.yaml
+
+The exported models are written next to the weights under the names the
+``detection.backend`` / ``detection.int8`` settings of ``config.yaml`` look
+for (``best.onnx``, ``best_int8.onnx``, ``best_openvino_model``,
+``best_int8_openvino_model``). Input shapes are exported as dynamic so
+batching and per-channel input sizes keep working.
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def letterbox(image: np.ndarray, imgsz: int) -> np.ndarray:
+    """Resize ``image`` into an ``imgsz`` square with gray padding, as Ultralytics does before inference."""
+    height, width = image.shape[:2]
+    scale = imgsz / max(height, width)
+    resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    canvas[top : top + resized.shape[0], left : left + resized.shape[1]] = resized
+    return canvas
+
+
+class CalibrationReader:
+    """Feeds preprocessed frames to ONNX Runtime static quantization one at a time."""
+
+    def __init__(self, input_name: str, images: list[Path], imgsz: int) -> None:
+        self.input_name = input_name
+        self.images = iter(images)
+        self.imgsz = imgsz
+
+    def get_next(self):
+        for path in self.images:
+            image = cv2.imread(str(path))
+            if image is None:
+                continue
+            rgb = cv2.cvtColor(letterbox(image, self.imgsz), cv2.COLOR_BGR2RGB)
+            tensor = np.ascontiguousarray(rgb.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+            return {self.input_name: tensor}
+        return None
+
+
+def quantize_onnx(model_path: Path, output_path: Path, calibration_dir: Path, imgsz: int, max_images: int) -> None:
+    """Quantize weights and activations of an ONNX model to INT8 using calibration frames."""
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    images = sorted(path for path in calibration_dir.rglob("*") if path.suffix.lower() in IMAGE_SUFFIXES)[:max_images]
+    if not images:
+        raise SystemExit(f"No calibration images found in {calibration_dir}")
+    model = onnx.load(str(model_path))
+    reader = CalibrationReader(model.graph.input[0].name, images, imgsz)
+    quantize_static(
+        str(model_path),
+        str(output_path),
+        reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    # Ultralytics reads the class names and input size from the model metadata.
+    quantized = onnx.load(str(output_path))
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, str(output_path))
+
+
+def export(weights: Path, export_format: str, int8: bool, imgsz: int, data: str | None, calibration_dir: Path | None, max_images: int) -> Path:
+    model = YOLO(str(weights))
+    if export_format == "openvino":
+        # OpenVINO quantizes with NNCF on the validation images of the dataset config.
+        return Path(model.export(format="openvino", imgsz=imgsz, dynamic=True, int8=int8, data=data))
+
+    exported = Path(model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True))
+    if not int8:
+        return exported
+    if calibration_dir is None:
+        raise SystemExit("--calibration-images is required for INT8 ONNX export")
+    output_path = exported.with_name(f"{exported.stem}_int8.onnx")
+    quantize_onnx(exported, output_path, calibration_dir, imgsz, max_images)
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the plate detector to ONNX or OpenVINO, optionally INT8.")
+    parser.add_argument("--weights", type=Path, default=Path("models/best.pt"), help="PyTorch weights to export")
+    parser.add_argument("--format", dest="export_format", choices=("onnx", "openvino"), default="onnx")
+    parser.add_argument("--int8", action="store_true", help="Quantize to INT8")
+    parser.add_argument("--imgsz", type=int, default=640, help="Input size used for export and calibration")
+    parser.add_argument("--data", default=None, help="Dataset config with calibration images (OpenVINO INT8)")
+    parser.add_argument("--calibration-images", type=Path, default=None, help="Directory of frames (ONNX INT8)")
+    parser.add_argument("--max-calibration-images", type=int, default=300)
+    args = parser.parse_args()
+
+    if args.int8 and args.export_format == "openvino" and args.data is None:
+        parser.error("--data is required for INT8 OpenVINO export")
+    path = export(
+        args.weights,
+        args.export_format,
+        args.int8,
+        args.imgsz,
+        args.data,
+        args.calibration_images,
+        args.max_calibration_images,
+    )
+    print(f"Exported {path}")
@@ -1,6 +1,7 @@
 """Helper utilities for working with YAML-based configuration files."""
 from __future__ import annotations
 
+import copy
 import logging
 from pathlib import Path
 from typing import Any, Dict
@@ -8,22 +9,113 @@ from typing import Any, Dict
 import yaml
 
 LOGGER = logging.getLogger(__name__)
-DEFAULT_CONFIG = {"plate_image_send_interval": 20, "video_paths": []}
+DEFAULT_CONFIG = {
+    "plate_image_send_interval": 20,
+    "video_paths": [],
+    "channel_settings": [],
+    "headless": {"sink": "stdout"},
+    "metrics": {"enabled": True, "host": "127.0.0.1", "port": 9108},
+    "event_store": {
+        "enabled": True,
+        "path": "data/plate_events.db",
+        "thumbnails_dir": "data/thumbnails",
+        "batch_size": 200,
+        "flush_interval": 1.0,
+        "max_queue": 10000,
+    },
+    "watchlists": {
+        "enabled": True,
+        "directory": "data/lists",
+        "max_cost": 1.0,
+        "confusion_cost": 0.3,
+        "reload_interval": 5.0,
+    },
+    "offline": {"workers": 0, "chunk_seconds": 600.0, "overlap_seconds": 10.0, "dedup_seconds": 30.0},
+    "workers": {
+        "enabled": False,
+        "channels_per_worker": 1,
+        "ring_slots": 4,
+        "max_frame_height": 1080,
+        "max_frame_width": 1920,
+    },
+    "capture": {"buffer_size": 1, "reconnect_delay": 1.0, "max_reconnect_delay": 30.0},
+    "motion": {
+        "enabled": True,
+        "width": 160,
+        "pixel_threshold": 25,
+        "min_changed_ratio": 0.002,
+        "keepalive_frames": 15,
+        "roi": None,
+    },
+    "detection": {"backend": "pytorch", "model_path": None, "int8": False, "max_batch_size": 8, "max_wait_ms": 15},
+    "tracking": {"iou_threshold": 0.3, "max_age": 30, "max_tracks": 256},
+    "trails": {"length": 30, "max_idle_frames": 30},
+    "load_shedding": {
+        "enabled": True,
+        "latency_budget_ms": 500.0,
+        "recover_ratio": 0.6,
+        "dwell_frames": 50,
+        "smoothing": 0.1,
+        "render_interval": 5,
+        "idle_detection_interval": 5,
+        "reduced_imgsz": 416,
+    },
+    "ocr": {
+        "mode": "recognize",
+        "max_corrections": 2,
+        "preprocess": "adaptive",
+        "target_height": 96,
+        "sharpness_threshold": 150.0,
+        "deskew": False,
+    },
+    "clips": {
+        "enabled": False,
+        "trigger": "watchlist",
+        "directory": "data/clips",
+        "pre_seconds": 5.0,
+        "post_seconds": 5.0,
+        "fps": 10.0,
+        "max_width": 1280,
+        "quality": 70,
+        "max_buffer_mb": 32.0,
+        "max_pending_clips": 4,
+        "max_clip_seconds": 60.0,
+    },
+    "debug_images": {
+        "enabled": False,
+        "directory": "data/debug",
+        "format": "jpg",
+        "quality": 90,
+        "sample_rate": 1.0,
+        "max_queue": 64,
+        "max_disk_mb": 500.0,
+    },
+    "crop_cache": {"enabled": True, "max_entries": 256, "ttl": 10.0, "hash_size": 8, "max_distance": 4, "cell_size": 24},
+    "ocr_cache": {
+        "max_attempts": 5,
+        "min_votes": 3,
+        "min_agreement": 0.6,
+        "retry_interval": 5,
+        "quality_gain": 1.2,
+        "max_idle_frames": 30,
+    },
+}
+DEFAULT_CHANNEL_SETTINGS = {"roi": None, "imgsz": 640}
 
 
 def load_config(config_path: str | Path) -> Dict[str, Any]:
     path = Path(config_path)
     if not path.exists():
         LOGGER.warning("Config %s not found. Falling back to defaults.", path)
-        return DEFAULT_CONFIG.copy()
+        return copy.deepcopy(DEFAULT_CONFIG)
 
     with path.open("r", encoding="utf-8") as file:
         try:
             config = yaml.safe_load(file) or {}
         except yaml.YAMLError as exc:  # noqa: BLE001
             LOGGER.error("Failed to parse config %s: %s", path, exc)
-            return DEFAULT_CONFIG.copy()
-    return {**DEFAULT_CONFIG, **config}
+            return copy.deepcopy(DEFAULT_CONFIG)
+    return _merge(DEFAULT_CONFIG, config)
 
 
 def save_config(config_path: str | Path, data: Dict[str, Any]) -> None:
@@ -31,3 +123,21 @@ def save_config(config_path: str | Path, data: Dict[str, Any]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     with path.open("w", encoding="utf-8") as file:
         yaml.safe_dump(data, file, allow_unicode=True, sort_keys=False)
+
+
+def get_channel_settings(config: Dict[str, Any], index: int | None) -> Dict[str, Any]:
+    """Return the settings of channel ``index`` completed with defaults."""
+    channels = config.get("channel_settings") or []
+    settings = channels[index] if index is not None and 0 <= index < len(channels) else None
+    return {**DEFAULT_CHANNEL_SETTINGS, **(settings or {})}
+
+
+def _merge(defaults: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge ``overrides`` into a copy of ``defaults``, recursing into nested sections."""
+    merged = copy.deepcopy(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
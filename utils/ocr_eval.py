@@ -0,0 +1,242 @@
+"""Accuracy and speed evaluation of OCR profiles over a directory of labelled plate crops.
+
+Run from the repository root::
+
+    python -m utils.ocr_eval data/plate_crops --output ocr_eval.json
+
+Labels are read from ``labels.csv`` in the crop directory (``file;plate`` or
+``file;plate;region`` per line) or, without it, from the file name up to the
+first ``_`` (``A123BC77_0001.jpg``). Every profile is a set of overrides of
+the ``ocr`` section of ``config.yaml``; preprocessed crops are cached on disk
+per preprocessing setting, so profiles that only change OCR options reuse
+them.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+import yaml
+
+from utils.config import DEFAULT_CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+PREPROCESS_KEYS = ("preprocess", "target_height", "sharpness_threshold", "deskew")
+DEFAULT_PROFILES = [
+    {"name": "adaptive"},
+    {"name": "adaptive-deskew", "deskew": True},
+    {"name": "legacy", "preprocess": "legacy"},
+    {"name": "detect", "mode": "detect"},
+]
+
+# Item of the dataset: crop path, plate label and region label (empty when unknown).
+_Sample = Tuple[str, str, str]
+
+_RECOGNIZERS: Dict[str, object] = {}
+
+
+def load_samples(directory: Path) -> List[_Sample]:
+    """Labelled crops of ``directory``, from ``labels.csv`` if present or from the file names."""
+    labels_path = directory / "labels.csv"
+    if labels_path.exists():
+        samples = []
+        for line in labels_path.read_text(encoding="utf-8").splitlines():
+            parts = [part.strip() for part in line.split(";")]
+            if len(parts) < 2 or not parts[0] or parts[0].startswith("#"):
+                continue
+            samples.append((str(directory / parts[0]), parts[1], parts[2] if len(parts) > 2 else ""))
+        return samples
+    return [
+        (str(path), path.stem.split("_", 1)[0], "")
+        for path in sorted(directory.iterdir())
+        if path.suffix.lower() in IMAGE_SUFFIXES
+    ]
+
+
+def load_profiles(path: Optional[str]) -> List[dict]:
+    if path is None:
+        return DEFAULT_PROFILES
+    with open(path, "r", encoding="utf-8") as file:
+        profiles = yaml.safe_load(file) or []
+    if not isinstance(profiles, list) or not all(isinstance(profile, dict) and "name" in profile for profile in profiles):
+        raise SystemExit(f"{path} must contain a list of profiles with a name each")
+    return profiles
+
+
+def evaluate(
+    directory: str | Path,
+    profiles: Sequence[dict],
+    workers: Optional[int] = None,
+    cache_dir: str | Path = "data/ocr_eval_cache",
+    patterns_path: str = "configs/plate_patterns.yaml",
+) -> Dict[str, dict]:
+    """Run every profile over the labelled crops of ``directory`` and return a summary per profile."""
+    samples = load_samples(Path(directory))
+    if not samples:
+        raise SystemExit(f"No labelled crops found in {directory}")
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, len(samples) // (workers * 4))
+    chunks = [samples[start : start + chunk_size] for start in range(0, len(samples), chunk_size)]
+    profiles = [{**DEFAULT_CONFIG["ocr"], **profile} for profile in profiles]
+
+    results: Dict[str, List[dict]] = {profile["name"]: [] for profile in profiles}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"), initializer=_init_worker) as pool:
+        futures = [
+            (profile["name"], pool.submit(_evaluate_chunk, profile, chunk, str(cache_dir), patterns_path))
+            for profile in profiles
+            for chunk in chunks
+        ]
+        for name, future in futures:
+            results[name].extend(future.result())
+    return {name: summarize(profile_results) for name, profile_results in results.items()}
+
+
+def summarize(results: Sequence[dict]) -> dict:
+    """Accuracy and latency figures of one profile."""
+    from watchlist import plate_distance
+
+    total = len(results)
+    exact = sum(result["prediction"] == result["label"] for result in results)
+    errors = sum(plate_distance(result["prediction"], result["label"], confusion_cost=1.0) for result in results)
+    label_chars = sum(len(result["label"]) for result in results)
+    with_region = [result for result in results if result["region"]]
+    preprocess = [result["preprocess_s"] for result in results if result["preprocess_s"] is not None]
+    return {
+        "crops": total,
+        "exact_match": round(exact / total, 4) if total else 0.0,
+        "cer": round(errors / label_chars, 4) if label_chars else 0.0,
+        "pattern_match": round(sum(result["matched"] for result in results) / total, 4) if total else 0.0,
+        "region_accuracy": (
+            round(sum(result["predicted_region"] == result["region"] for result in with_region) / len(with_region), 4)
+            if with_region
+            else None
+        ),
+        "preprocess_ms": _latency(preprocess),
+        "preprocess_cached": total - len(preprocess),
+        "ocr_ms": _latency([result["ocr_s"] for result in results]),
+    }
+
+
+def _latency(seconds: Sequence[float]) -> Optional[dict]:
+    if not seconds:
+        return None
+    milliseconds = np.asarray(seconds) * 1000.0
+    p50, p95 = np.percentile(milliseconds, (50, 95))
+    return {"mean": round(float(milliseconds.mean()), 3), "p50": round(float(p50), 3), "p95": round(float(p95), 3)}
+
+
+def _evaluate_chunk(profile: dict, samples: Sequence[_Sample], cache_dir: str, patterns_path: str) -> List[dict]:
+    from watchlist import normalize_plate
+
+    recognizer = _recognizer(profile, patterns_path)
+    preprocess_key = json.dumps({key: profile[key] for key in PREPROCESS_KEYS}, sort_keys=True)
+    cache = Path(cache_dir) / hashlib.sha1(preprocess_key.encode("utf-8")).hexdigest()[:12]
+    cache.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    for path, label, region in samples:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            LOGGER.warning("Cannot read %s", path)
+            continue
+        cached = cache / f"{hashlib.sha1(f'{path}|{stat.st_size}|{stat.st_mtime_ns}'.encode('utf-8')).hexdigest()}.png"
+        preprocess_seconds = None
+        crop = cv2.imread(str(cached), cv2.IMREAD_GRAYSCALE) if cached.exists() else None
+        if crop is None:
+            image = cv2.imread(path)
+            if image is None:
+                LOGGER.warning("Cannot read %s", path)
+                continue
+            started = time.perf_counter()
+            crop = recognizer.preprocess_image(image)
+            preprocess_seconds = time.perf_counter() - started
+            # Profiles sharing the preprocessing run concurrently; never leave a half-written crop behind.
+            partial = cached.with_name(f"{cached.stem}.{os.getpid()}.png")
+            if cv2.imwrite(str(partial), crop):
+                os.replace(partial, cached)
+        started = time.perf_counter()
+        reading = recognizer.recognize_batch([crop])[0]
+        ocr_seconds = time.perf_counter() - started
+        results.append(
+            {
+                "file": path,
+                "label": normalize_plate(label),
+                "region": region,
+                "prediction": normalize_plate(reading.text) if reading is not None else "",
+                "predicted_region": reading.region if reading is not None else "",
+                "matched": reading is not None,
+                "preprocess_s": preprocess_seconds,
+                "ocr_s": ocr_seconds,
+            }
+        )
+    return results
+
+
+def _recognizer(profile: dict, patterns_path: str):
+    """The worker's recognizer for ``profile``, created on first use."""
+    from recognition_plate import PlateRecognizer
+
+    recognizer = _RECOGNIZERS.get(profile["name"])
+    if recognizer is None:
+        recognizer = _RECOGNIZERS[profile["name"]] = PlateRecognizer(
+            patterns_path=patterns_path,
+            ocr_mode=profile["mode"],
+            max_corrections=profile["max_corrections"],
+            preprocess=profile["preprocess"],
+            target_height=profile["target_height"],
+            sharpness_threshold=profile["sharpness_threshold"],
+            deskew=profile["deskew"],
+        )
+    return recognizer
+
+
+def _init_worker() -> None:
+    import torch
+
+    logging.basicConfig(level=logging.WARNING)
+    # Crops are spread over processes; one thread each keeps the per-crop latencies comparable.
+    torch.set_num_threads(1)
+    cv2.setNumThreads(1)
+
+
+def _format_table(summaries: Dict[str, dict]) -> str:
+    lines = [f"{'profile':<20} {'exact':>7} {'CER':>7} {'pattern':>8} {'region':>7} {'prep ms':>8} {'ocr ms':>8}"]
+    for name, summary in summaries.items():
+        region = summary["region_accuracy"]
+        preprocess = summary["preprocess_ms"]["mean"] if summary["preprocess_ms"] else float("nan")
+        lines.append(
+            f"{name:<20} {summary['exact_match']:>7.3f} {summary['cer']:>7.3f} {summary['pattern_match']:>8.3f} "
+            f"{region if region is not None else float('nan'):>7.3f} {preprocess:>8.2f} {summary['ocr_ms']['mean']:>8.2f}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Evaluate OCR profiles on labelled plate crops.")
+    parser.add_argument("directory", help="Directory with plate crops and optionally labels.csv")
+    parser.add_argument("--profiles", default=None, help="YAML list of profiles (overrides of the ocr config section)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--cache-dir", default="data/ocr_eval_cache", help="Where preprocessed crops are cached")
+    parser.add_argument("--patterns", default="configs/plate_patterns.yaml", help="Plate patterns file")
+    parser.add_argument("--output", default=None, help="Also write the summaries to this JSON file")
+    args = parser.parse_args()
+
+    summaries = evaluate(args.directory, load_profiles(args.profiles), args.workers, args.cache_dir, args.patterns)
+    print(_format_table(summaries))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(summaries, file, indent=2, ensure_ascii=False)
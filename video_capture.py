@@ -0,0 +1,158 @@
+"""Background frame grabbing that keeps live streams close to real time."""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Deque, Optional, Tuple
+
+import cv2
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class CaptureStats:
+    """Frame counters of a single source."""
+
+    decoded: int = 0
+    dropped: int = 0
+    processed: int = 0
+    reconnects: int = 0
+
+
+class FrameGrabber:
+    """Decodes a video source on its own thread and hands out the newest frames.
+
+    Live sources (RTSP/HTTP streams) keep at most ``buffer_size`` frames and
+    drop the oldest one when the consumer falls behind, so latency stays
+    bounded no matter how slow inference is; lost streams are reopened with
+    exponential backoff. File sources are paced to their native FPS and never
+    drop frames: decoding simply waits for the consumer.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        buffer_size: int = 1,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+        on_decode: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        self.source = source
+        self.on_decode = on_decode
+        self.buffer_size = max(1, int(buffer_size))
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.is_live = is_live_source(source)
+        self.stats = CaptureStats()
+        self._frames: Deque[Tuple[float, np.ndarray]] = deque(maxlen=self.buffer_size)
+        self.last_timestamp = 0.0
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._finished = False
+        self._thread = threading.Thread(target=self._run, name=f"grabber-{source}", daemon=True)
+
+    def start(self) -> "FrameGrabber":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def read(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Return the next buffered frame, or ``None`` once the source has ended or ``timeout`` expired.
+
+        ``last_timestamp`` is set to the :func:`time.monotonic` time the returned frame was decoded at.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._frames or self._finished, timeout):
+                return None
+            if not self._frames:
+                return None
+            self.last_timestamp, frame = self._frames.popleft()
+            self.stats.processed += 1
+            self._condition.notify_all()
+            return frame
+
+    @property
+    def pending(self) -> int:
+        """Number of decoded frames waiting to be read."""
+        return len(self._frames)
+
+    @property
+    def finished(self) -> bool:
+        """Whether the source has ended and every decoded frame has been read."""
+        with self._condition:
+            return self._finished and not self._frames
+
+    def _run(self) -> None:
+        delay = self.reconnect_delay
+        connected_before = False
+        try:
+            while not self._stop_event.is_set():
+                cap = cv2.VideoCapture(self.source)
+                if cap.isOpened():
+                    if connected_before:
+                        self.stats.reconnects += 1
+                        LOGGER.info("Reconnected to %s", self.source)
+                    connected_before = True
+                    delay = self.reconnect_delay
+                    self._decode(cap)
+                else:
+                    LOGGER.error("Could not open video source %s", self.source)
+                cap.release()
+
+                if not self.is_live:
+                    return
+                LOGGER.warning("Stream %s interrupted, reconnecting in %.1f s", self.source, delay)
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+        finally:
+            with self._condition:
+                self._finished = True
+                self._condition.notify_all()
+
+    def _decode(self, cap: cv2.VideoCapture) -> None:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        frame_delay = 0.0 if self.is_live else 1.0 / fps
+        next_frame_time = time.monotonic()
+        while not self._stop_event.is_set():
+            started = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                return
+            if self.on_decode is not None:
+                self.on_decode(time.perf_counter() - started)
+            self._push(frame)
+            if frame_delay:
+                next_frame_time = max(next_frame_time + frame_delay, time.monotonic() - frame_delay)
+                self._stop_event.wait(max(0.0, next_frame_time - time.monotonic()))
+
+    def _push(self, frame: np.ndarray) -> None:
+        with self._condition:
+            self.stats.decoded += 1
+            if len(self._frames) == self.buffer_size:
+                if not self.is_live:
+                    self._condition.wait_for(
+                        lambda: len(self._frames) < self.buffer_size or self._stop_event.is_set()
+                    )
+                    if self._stop_event.is_set():
+                        return
+                else:
+                    self.stats.dropped += 1
+            self._frames.append((time.monotonic(), frame))
+            self._condition.notify_all()
+
+
+def is_live_source(source: str) -> bool:
+    """Whether ``source`` is a network stream rather than a local file."""
+    return "://" in str(source) and not Path(str(source)).exists()
@@ -0,0 +1,202 @@
+"""Plate watchlists with OCR-error tolerant matching."""
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from plate_format import fold_homoglyphs
+from utils.config import DEFAULT_CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+# Characters OCR commonly confuses; each group folds to its first character.
+CONFUSION_GROUPS = ("0ODQ", "8B", "1I", "5S", "2Z", "6G", "4A")
+_FOLD = str.maketrans({char: group[0] for group in CONFUSION_GROUPS for char in group[1:]})
+
+WATCHLIST = None
+_WATCHLIST_LOCK = threading.Lock()
+
+
+@dataclass
+class WatchlistHit:
+    """A recognized plate that matched an entry of a list."""
+
+    list_name: str
+    plate: str
+    cost: float
+
+
+def normalize_plate(text: str) -> str:
+    """Uppercase ``text``, fold Cyrillic look-alikes to Latin and drop everything but letters and digits."""
+    return "".join(char for char in fold_homoglyphs(text) if char.isalnum())
+
+
+def plate_distance(a: str, b: str, confusion_cost: float = 0.3) -> float:
+    """Edit distance between normalized plates where OCR-confusable substitutions are cheaper."""
+    previous = [float(index) for index in range(len(b) + 1)]
+    for i, char_a in enumerate(a, 1):
+        current = [float(i)]
+        folded_a = char_a.translate(_FOLD)
+        for j, char_b in enumerate(b, 1):
+            if char_a == char_b:
+                substitution = 0.0
+            elif folded_a == char_b.translate(_FOLD):
+                substitution = confusion_cost
+            else:
+                substitution = 1.0
+            current.append(min(previous[j] + 1.0, current[j - 1] + 1.0, previous[j - 1] + substitution))
+        previous = current
+    return previous[-1]
+
+
+class Watchlist:
+    """Named plate lists loaded from ``<directory>/<name>.txt`` files.
+
+    Plates are indexed by their confusion-folded form and every variant with
+    one character deleted, so a lookup touches a handful of dictionary keys
+    regardless of the list size; the few candidates found are then verified
+    with :func:`plate_distance`. This catches any number of confusions such as
+    ``O``/``0`` or ``B``/``8`` plus one missing, extra or wrong character.
+
+    :meth:`reload` re-reads only the files whose modification time changed
+    and applies the difference to the index, so lists can be edited while
+    channels are running.
+    """
+
+    def __init__(self, directory: str | Path = "data/lists", max_cost: float = 1.0, confusion_cost: float = 0.3) -> None:
+        self.directory = Path(directory)
+        self.max_cost = max_cost
+        self.confusion_cost = confusion_cost
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._file_mtimes: Dict[str, float] = {}
+        self._list_plates: Dict[str, Set[str]] = {}
+        self._plate_lists: Dict[str, Set[str]] = {}
+        self._index: Dict[str, Set[str]] = {}
+        self._stop_event = threading.Event()
+        self._reload_thread: Optional[threading.Thread] = None
+
+    @property
+    def lists(self) -> Dict[str, int]:
+        """Loaded list names and their sizes."""
+        with self._lock:
+            return {name: len(plates) for name, plates in sorted(self._list_plates.items())}
+
+    def match(self, text: str) -> List[WatchlistHit]:
+        """Return the list entries within ``max_cost`` of the recognized ``text``, closest first."""
+        plate = normalize_plate(text)
+        if not plate:
+            return []
+        hits = []
+        with self._lock:
+            candidates = set()
+            for key in _index_keys(plate):
+                candidates |= self._index.get(key, set())
+            for candidate in candidates:
+                cost = plate_distance(plate, candidate, self.confusion_cost)
+                if cost <= self.max_cost:
+                    hits.extend(WatchlistHit(name, candidate, cost) for name in self._plate_lists[candidate])
+        return sorted(hits, key=lambda hit: (hit.cost, hit.list_name))
+
+    def add(self, list_name: str, text: str) -> None:
+        """Append a plate to a list file; it is indexed on the next :meth:`reload`."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with (self.directory / f"{list_name}.txt").open("a", encoding="utf-8") as file:
+            file.write(f"{text.strip()}\n")
+
+    def reload(self) -> None:
+        """Apply changes of the list files made since the previous call."""
+        with self._reload_lock:
+            paths = {path.stem: path for path in self.directory.glob("*.txt")} if self.directory.is_dir() else {}
+            for name in set(self._file_mtimes) - set(paths):
+                self._apply(name, set())
+                del self._file_mtimes[name]
+            for name, path in paths.items():
+                try:
+                    mtime = path.stat().st_mtime
+                    if self._file_mtimes.get(name) == mtime:
+                        continue
+                    plates = _read_list(path)
+                except OSError as exc:
+                    LOGGER.warning("Failed to read watchlist %s: %s", path, exc)
+                    continue
+                self._file_mtimes[name] = mtime
+                self._apply(name, plates)
+
+    def start(self, interval: float = 5.0) -> "Watchlist":
+        """Load the lists and keep reloading changed files every ``interval`` seconds in the background."""
+        self.reload()
+        self._reload_thread = threading.Thread(target=self._reload_loop, args=(interval,), name="watchlist-reload", daemon=True)
+        self._reload_thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._reload_thread is not None:
+            self._reload_thread.join()
+            self._reload_thread = None
+
+    def _reload_loop(self, interval: float) -> None:
+        while not self._stop_event.wait(interval):
+            self.reload()
+
+    def _apply(self, name: str, plates: Set[str]) -> None:
+        previous = self._list_plates.get(name, set())
+        added, removed = plates - previous, previous - plates
+        if not added and not removed:
+            return
+        # Lock per plate so a large edit never holds up matching on the channels for long.
+        for plate in removed:
+            with self._lock:
+                lists = self._plate_lists[plate]
+                lists.discard(name)
+                if not lists:
+                    del self._plate_lists[plate]
+                    for key in _index_keys(plate):
+                        bucket = self._index[key]
+                        bucket.discard(plate)
+                        if not bucket:
+                            del self._index[key]
+        for plate in added:
+            with self._lock:
+                if plate not in self._plate_lists:
+                    self._plate_lists[plate] = set()
+                    for key in _index_keys(plate):
+                        self._index.setdefault(key, set()).add(plate)
+                self._plate_lists[plate].add(name)
+        with self._lock:
+            if plates:
+                self._list_plates[name] = plates
+            else:
+                self._list_plates.pop(name, None)
+        LOGGER.info("Watchlist %s: %s plates (+%s, -%s)", name, len(plates), len(added), len(removed))
+
+
+def _index_keys(plate: str) -> Set[str]:
+    folded = plate.translate(_FOLD)
+    return {folded, *(folded[:index] + folded[index + 1 :] for index in range(len(folded)))}
+
+
+def _read_list(path: Path) -> Set[str]:
+    plates = set()
+    for line in path.read_text(encoding="utf-8").splitlines():
+        plate = normalize_plate(line.split("#", 1)[0])
+        if plate:
+            plates.add(plate)
+    return plates
+
+
+def get_watchlist(config: dict) -> Optional[Watchlist]:
+    """Return the process-wide watchlist, or ``None`` when it is disabled."""
+    global WATCHLIST
+    watchlist_config = {**DEFAULT_CONFIG["watchlists"], **config.get("watchlists", {})}
+    if not watchlist_config.pop("enabled"):
+        return None
+    reload_interval = watchlist_config.pop("reload_interval")
+    with _WATCHLIST_LOCK:
+        if WATCHLIST is None:
+            WATCHLIST = Watchlist(**watchlist_config).start(reload_interval)
+        return WATCHLIST